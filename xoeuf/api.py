@@ -142,7 +142,7 @@ def leaking_context(leak=False):
         return Context(_DONT_SKIP_ACTIVE_IDS)
 
 
-def onupdate(*args):
+def onupdate(*args, writes=None):
     """A decorator to trigger updates on dependencies.
 
     Return a decorator that specifies the field dependencies of an updater
@@ -160,14 +160,35 @@ def onupdate(*args):
     One may also pass a single function as argument. In that case, the
     dependencies are given by calling the function with the field's model.
 
+    The names of the fields the method writes can be given in `writes`.
+    They are used to order the updater methods and to detect cycles among
+    them (see `xoeuf.models.base.OnUpdateGraph`:class:)::
+
+        @api.onupdate('partner_id.name', writes=('pname',))
+
+    .. warning:: The fields written are not inferred from the method.  If
+       the method writes fields which trigger other updaters, declare them;
+       otherwise those updaters may be called before it and a cycle among
+       them is only noticed when `~xoeuf.models.base.OnUpdateQueue`:class:
+       gives up draining it.  Pass an empty `writes` if it doesn't write
+       any.
+
     .. note:: ``@onupdate`` is very similar to ``@constraint`` but with just
        one key difference: It allow dot-separated fields in arguments.
 
     .. versionadded: 0.46.0
 
+    .. versionchanged:: 2.6.0 Add argument `writes`.
+
     """
     if args and callable(args[0]):
         args = args[0]
     elif any("id" in arg.split(".") for arg in args):
         raise NotImplementedError("Updater method cannot depend on field 'id'.")
-    return _odoo_api.attrsetter("_onupdates", args)
+    setter = _odoo_api.attrsetter("_onupdates", args)
+
+    def decorator(method):
+        method._onupdate_writes = None if writes is None else tuple(writes)
+        return setter(method)
+
+    return decorator
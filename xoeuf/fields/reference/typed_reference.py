@@ -8,7 +8,7 @@
 #
 from odoo import api, fields, models, _
 from xoeuf.osv.expression import Domain, FALSE_LEAF
-from xoeuf.models import iter_descendant_models
+from xoeuf.models import get_descendant_model_names, iter_descendant_models
 
 
 def get_mixin_descendants(pool, mixin):
@@ -25,6 +25,18 @@ def get_mixin_descendants(pool, mixin):
     )
 
 
+def is_mixin_descendant(pool, mixin, modelname):
+    """Check if the model `modelname` inherits from `mixin`.
+
+    .. versionadded:: 2.6.0
+
+    """
+    descendants = get_descendant_model_names(
+        pool, [mixin], find_delegated=False, allow_transient=True
+    )
+    return modelname in descendants
+
+
 class TypedReference(fields.Reference):
     """A reference field filtered by a type (mixin).
 
@@ -75,11 +87,7 @@ class TypedReference(fields.Reference):
         )
         if res and validate:
             res_model, res_id = res
-            descendants = [
-                model_name
-                for model_name in get_mixin_descendants(record.pool, self.mixin)
-            ]
-            if res_model not in descendants:
+            if not is_mixin_descendant(record.pool, self.mixin, res_model):
                 raise ValueError(_("Wrong value for %s: %r") % (self, res))
         return res
 
@@ -6,13 +6,21 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
-from collections import defaultdict
+import heapq
+import logging
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
 from inspect import getmembers
+from operator import itemgetter
+from weakref import WeakKeyDictionary
 
 from odoo import api, models, tools
+from odoo.modules.registry import Registry
 from xoeuf.osv.expression import Domain
 from xoeuf.modules import get_caller_addon
 
+logger = logging.getLogger(__name__)
+
 
 def get_modelname(model):
     """Gets the ORM object's name for a model class/object.
@@ -76,6 +84,7 @@ def _setup_base(self, *args, **kwargs):
     res = super_setup_base(self, *args, **kwargs)
     if do_setup:
         cls._method_triggers = tools.Collector()
+        cls._onupdate_queries = {}
     return res
 
 
@@ -151,6 +160,228 @@ def setup_triggers(self):
 models.BaseModel.setup_triggers = setup_triggers
 
 
+class OnUpdateGraph(object):
+    """The graph of the updater methods of a registry.
+
+    The nodes of the graph are the updater methods, identified by a pair
+    ``(model_name, method_name)``.  There's an edge from an updater to
+    another if the first writes a field (see the argument `writes` of
+    `xoeuf.api.onupdate`:func:) which triggers the second.
+
+    .. warning:: The fields an updater writes are not inferred from its code.
+       An updater which doesn't declare them has no edges, so the updaters it
+       triggers may be called before it, and its cycles are not detected.
+       The updaters without `writes` whose model has fields which trigger
+       updaters are listed in `undeclared` (and logged with level DEBUG when
+       the registry is loaded).
+
+    :param triggers: A mapping from ``(model_name, field_name)`` to the
+           list of ``(model_name, method_name, path)`` it triggers.
+
+    :param writes: A mapping from each updater which declares the fields it
+           writes to the names of those fields.
+
+    :param modules: The names of the modules installed in the registry.
+
+    The graph holds only strings, so that it's cheap to serialize (see
+    `as_dict`:meth:).  It is not persisted: it's rebuilt each time the
+    models of the registry are set up.  Use `get_onupdate_graph`:func: to get the graph of
+    a registry.
+
+    .. versionadded:: 2.6.0
+
+    """
+
+    __slots__ = (
+        "triggers",
+        "writes",
+        "modules",
+        "edges",
+        "order",
+        "cycles",
+        "undeclared",
+    )
+
+    def __init__(self, triggers, writes, modules=()):
+        self.triggers = {
+            key: tuple(sorted(set(map(tuple, values)), key=repr))
+            for key, values in triggers.items()
+        }
+        self.writes = {key: frozenset(fnames) for key, fnames in writes.items()}
+        self.modules = frozenset(modules)
+        self.edges = {
+            (model_name, method): set()
+            for values in self.triggers.values()
+            for model_name, method, _ in values
+        }
+        for (model_name, method), fnames in self.writes.items():
+            edges = self.edges.setdefault((model_name, method), set())
+            for fname in fnames:
+                for target, target_method, _ in self.triggers.get(
+                    (model_name, fname), ()
+                ):
+                    edges.add((target, target_method))
+        self.order, self.cycles = _sort_topologically(self.edges)
+        triggering = {model_name for model_name, _ in self.triggers}
+        self.undeclared = sorted(
+            node
+            for node in self.edges
+            if node not in self.writes and node[0] in triggering
+        )
+
+    @classmethod
+    def from_registry(cls, registry):
+        """Build the graph of `registry` from the triggers of its models."""
+        triggers = {}
+        writes = {}
+        for model_name, model in registry.models.items():
+            for field, values in getattr(model, "_method_triggers", {}).items():
+                result = triggers.setdefault((model_name, field.name), [])
+                for method, target, path in values:
+                    result.append((target, method.__name__, path))
+                    fnames = getattr(method, "_onupdate_writes", None)
+                    if fnames is not None:
+                        writes[(target, method.__name__)] = fnames
+        return cls(triggers, writes, getattr(registry, "_init_modules", ()))
+
+    def as_dict(self):
+        """Return the graph as a dict of lists; `from_dict`:meth: rebuilds it."""
+        return {
+            "triggers": [
+                [model_name, fname, [list(value) for value in values]]
+                for (model_name, fname), values in sorted(self.triggers.items())
+            ],
+            "writes": [
+                [model_name, method, sorted(fnames)]
+                for (model_name, method), fnames in sorted(self.writes.items())
+            ],
+            "modules": sorted(self.modules),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            {
+                (model_name, fname): values
+                for model_name, fname, values in data["triggers"]
+            },
+            {
+                (model_name, method): fnames
+                for model_name, method, fnames in data["writes"]
+            },
+            data["modules"],
+        )
+
+    def get_fanout(self, model_name, fname):
+        """Return the number of updater methods triggered by the field."""
+        return len(
+            {
+                (target, method)
+                for target, method, _ in self.triggers.get((model_name, fname), ())
+            }
+        )
+
+    def get_rank(self, model_name, method):
+        """Return the position of the updater in the topological order.
+
+        Updaters in a cycle come after the rest.  Unknown updaters come
+        last.
+
+        """
+        return self.order.get((model_name, method), len(self.order))
+
+
+def _sort_topologically(edges):
+    # Return the map from each node to its position in a topological order
+    # of the graph, and the list of cycles (as sorted tuples of nodes).
+    incoming = {node: 0 for node in edges}
+    for targets in edges.values():
+        for target in targets:
+            incoming[target] = incoming.get(target, 0) + 1
+    ready = [node for node, count in incoming.items() if not count]
+    heapq.heapify(ready)
+    order = {}
+    while ready:
+        node = heapq.heappop(ready)
+        order[node] = len(order)
+        for target in edges.get(node, ()):
+            incoming[target] -= 1
+            if not incoming[target]:
+                heapq.heappush(ready, target)
+    # The nodes which were not ordered are in a cycle or reachable from one.
+    remaining = sorted(node for node in incoming if node not in order)
+    reachable = {node: _get_reachable(edges, node) for node in remaining}
+    cycles = []
+    for node in remaining:
+        if node in reachable[node] and not any(node in cycle for cycle in cycles):
+            cycles.append(
+                tuple(
+                    other
+                    for other in remaining
+                    if other in reachable[node] and node in reachable[other]
+                )
+            )
+        order[node] = len(order)
+    return order, cycles
+
+
+def _get_reachable(edges, node):
+    result = set()
+    pending = list(edges.get(node, ()))
+    while pending:
+        node = pending.pop()
+        if node not in result:
+            result.add(node)
+            pending.extend(edges.get(node, ()))
+    return result
+
+
+def get_onupdate_graph(pool_or_env):
+    """Return the `OnUpdateGraph`:class: of the registry.
+
+    :param pool_or_env: A registry or an Environment.
+
+    .. versionadded:: 2.6.0
+
+    """
+    if isinstance(pool_or_env, api.Environment):
+        registry = pool_or_env.registry
+    else:
+        registry = pool_or_env
+    result = getattr(registry, "_onupdate_graph", None)
+    if result is None:
+        result = registry._onupdate_graph = OnUpdateGraph.from_registry(registry)
+    return result
+
+
+# extend :meth:`odoo.modules.registry.Registry.setup_models`
+super_setup_models = Registry.setup_models
+
+
+def setup_models(self, cr):
+    self._descendant_models = {}
+    res = super_setup_models(self, cr)
+    self._onupdate_graph = graph = OnUpdateGraph.from_registry(self)
+    for cycle in graph.cycles:
+        logger.warning(
+            "Cyclic dependency between the updater methods: %s",
+            ", ".join("%s.%s" % node for node in cycle),
+        )
+    for node in graph.undeclared:
+        # Updaters without `writes` were the norm, this would flood the logs
+        # on every setup of the registry (i.e for each module loaded).
+        logger.debug(
+            "The updater method %s.%s doesn't declare the fields it writes; "
+            "the updaters it triggers may be called before it.  "
+            "Pass them in the argument `writes` of onupdate.",
+            *node,
+        )
+    return res
+
+
+Registry.setup_models = setup_models
+
+
 # add :meth:`odoo.models.BaseModel.update_onupdate`
 @api.multi
 def execute_onupdate(self, fnames):
@@ -161,38 +392,408 @@ def execute_onupdate(self, fnames):
 
     .. versionchanged:: 0.48.0 Ignore unknown fields.
 
+    .. versionchanged:: 2.6.0 The records linked to ``self`` are found with
+       a single SQL query for all the updater methods of the same model.
+       Within `deferred_onupdate`:func: the updater methods are queued.
+       The updater methods are called in the order of the
+       `OnUpdateGraph`:class:.  Fields which `write()` didn't change don't
+       trigger updater methods.
+
     """
-    # group triggers by (model, path) to minimize the calls to search()
-    triggers = defaultdict(set)
+    # group triggers by model and method, so that the paths of all the
+    # methods of a model are resolved at once.
+    triggers = defaultdict(lambda: defaultdict(set))
     # Take only the fields that are in the model. This is necessary because in
     # some rare cases this method is called with fields that may not be in the
     # model. (e.g. xopgi_object_merger).
+    handled = _onupdate_handled.get(self.env.cr, {})
     for fname in set(fnames) & set(self._fields):
+        # `write` triggers the fields it compared by itself
+        written = handled.get((self._name, fname), ())
+        if all(id in written for id in self.ids):
+            continue
         mfield = self._fields[fname]
-        # group triggers by model and path to reduce the number of search()
         for method, model_name, path in self._method_triggers[mfield]:
-            triggers[(model_name, method)].add(path)
+            triggers[model_name][method].add(path)
     # process triggers, mark fields to be invalidated/recomputed
-    for model_method, paths in triggers.items():
-        model_name, method = model_method
-        # process stored fields
-        if paths:
+    graph = get_onupdate_graph(self.env)
+    calls = []
+    for model_name, methods in triggers.items():
+        paths = set().union(*methods.values())
+        targets = self._get_onupdate_targets(model_name, paths)
+        for method, method_paths in methods.items():
             # determine records of model_name linked by any of paths to self
-            if any(path == "id" for path in paths):
-                target = self
-            else:
-                env = self.sudo().with_context({"active_test": False}).env
-                target = env[model_name].search(
-                    Domain.OR(*([(path, "in", self.ids)] for path in paths))
-                )
-                target = target.with_env(self.env)
-            # prepare recomputation for each field on linked records
+            ids = set().union(*(targets[path] for path in method_paths))
+            rank = graph.get_rank(model_name, method.__name__)
+            calls.append((rank, method, self.env[model_name].browse(sorted(ids))))
+    # call the updaters in topological order
+    queue = _onupdate_queues.get(self.env.cr)
+    for _, method, target in sorted(calls, key=itemgetter(0)):
+        if queue is None:
             method(target)
+        else:
+            queue.push(method, target)
 
 
 models.BaseModel.execute_onupdate = execute_onupdate
 
 
+# add :meth:`odoo.models.BaseModel._get_onupdate_targets`
+@api.multi
+def _get_onupdate_targets(self, model_name, paths):
+    """Return the ids of the records of `model_name` linked to ``self``.
+
+    The result maps each path in `paths` to the set of ids of the records
+    whose `path` contains any record in ``self``.  All the paths which can
+    be expressed as joins of tables are resolved with a single query; the
+    rest are resolved with `_search_onupdate_targets`:meth:.
+
+    """
+    result = {}
+    if not self:
+        return dict.fromkeys(paths, frozenset())
+    model = self.env[model_name]
+    queries = []
+    for path in paths:
+        if path == "id":
+            result[path] = set(self.ids)
+            continue
+        query = model._get_onupdate_query(path)
+        if query is None:
+            result[path] = set(self._search_onupdate_targets(model_name, [path]).ids)
+        else:
+            result[path] = set()
+            queries.append((path, query))
+    if queries:
+        self.env.cr.execute(
+            " UNION ALL ".join(
+                "SELECT {}, t.id FROM ({}) AS t(id)".format(index, query)
+                for index, (_, query) in enumerate(queries)
+            ),
+            {"ids": tuple(self.ids)},
+        )
+        for index, id in self.env.cr.fetchall():
+            result[queries[index][0]].add(id)
+    return result
+
+
+models.BaseModel._get_onupdate_targets = _get_onupdate_targets
+
+
+# add :meth:`odoo.models.BaseModel._search_onupdate_targets`
+@api.multi
+def _search_onupdate_targets(self, model_name, paths):
+    """Return the records of `model_name` linked to ``self`` by any of `paths`.
+
+    This is done with `search()`, so that it works for any kind of path.
+
+    """
+    env = self.sudo().with_context({"active_test": False}).env
+    target = env[model_name].search(
+        Domain.OR(*([(path, "in", self.ids)] for path in paths))
+    )
+    return target.with_env(self.env)
+
+
+models.BaseModel._search_onupdate_targets = _search_onupdate_targets
+
+
+# add :meth:`odoo.models.BaseModel._get_onupdate_query`
+@api.model
+def _get_onupdate_query(self, path):
+    """Return the SQL query of the ids of the records linked by `path`.
+
+    The query selects the ids of the records of this model whose `path`
+    contains any of the ids in the parameter ``%(ids)s``.  Return None if
+    any field in the path is not a plain stored relational field (e.g it's
+    inherited, or it has a domain).
+
+    """
+    cls = type(self)
+    try:
+        return cls._onupdate_queries[path]
+    except KeyError:
+        pass
+    query = None
+    steps = _get_onupdate_query_steps(self, path)
+    if steps is not None:
+        operand = "%(ids)s"
+        for table, column, key in reversed(steps):
+            query = 'SELECT "{}" FROM "{}" WHERE "{}" IN {}'.format(
+                column, table, key, operand
+            )
+            if column != "id":
+                query += ' AND "{}" IS NOT NULL'.format(column)
+            operand = "({})".format(query)
+    cls._onupdate_queries[path] = query
+    return query
+
+
+models.BaseModel._get_onupdate_query = _get_onupdate_query
+
+
+def _get_onupdate_query_steps(model, path):
+    # Return a list of `(table, column, key)` for each field in `path`: the
+    # records linked to the ids in the next step are ``SELECT column FROM
+    # table WHERE key IN (ids)``.  Return None if some field can't be
+    # expressed like that.
+    def is_plain(field):
+        return field.store and not field.inherited and not field.company_dependent
+
+    result = []
+    for fname in path.split("."):
+        field = model._fields.get(fname)
+        if field is None or not is_plain(field):
+            return None
+        comodel = model.env.get(field.comodel_name)
+        if field.type == "many2one":
+            result.append((model._table, "id", field.name))
+        elif field.type == "one2many" and not field.domain:
+            inverse = comodel._fields.get(field.inverse_name)
+            if inverse is None or inverse.type != "many2one" or not is_plain(inverse):
+                return None
+            result.append((comodel._table, inverse.name, "id"))
+        elif field.type == "many2many" and not field.domain:
+            result.append((field.relation, field.column1, field.column2))
+        else:
+            return None
+        model = comodel
+    return result
+
+
+# The queues of updater methods of the cursors within `deferred_onupdate`.
+_onupdate_queues = WeakKeyDictionary()
+
+
+class OnUpdateQueue(object):
+    """The updater methods triggered in a transaction, waiting to be called.
+
+    Each updater method is called once with the union of all the records it
+    was triggered for (with the same environment).  The updater methods are
+    called in the order of the `OnUpdateGraph`:class:.
+
+    Cyclic updaters may trigger each other forever.  If an updater method is
+    called more than `max_calls` times for the same records while draining,
+    the pending methods are discarded and RuntimeError is raised.  Calls for
+    other records (e.g a large fan-out) are not counted together.
+
+    .. versionadded:: 2.6.0
+
+    """
+
+    #: The maximum number of calls to each updater method with the same
+    #: records in `drain`:meth:.  Set it in the class or in an instance.
+    max_calls = 100
+
+    def __init__(self):
+        self.pending = OrderedDict()
+        self.draining = False
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, method, records):
+        if not records:
+            return
+        if not self.pending:
+            records.env.cr.after("rollback", self.pending.clear)
+        key = (method, records._name, records.env)
+        self.pending.setdefault(key, set()).update(records.ids)
+
+    def drain(self):
+        """Call the pending updater methods.
+
+        The updater methods may trigger others, which are called as well
+        before returning.
+
+        """
+        if self.draining:
+            return
+        self.draining = True
+        calls = Counter()
+        try:
+            while self.pending:
+                # Call first the updater which comes first in the graph,
+                # the records of the ones it triggers are merged.
+                key = min(self.pending, key=_get_pending_rank)
+                ids = frozenset(self.pending.pop(key))
+                calls[key, ids] += 1
+                if calls[key, ids] > self.max_calls:
+                    self.pending.clear()
+                    raise RuntimeError(_get_cycle_message(key, self.max_calls))
+                method, model_name, env = key
+                method(env[model_name].browse(sorted(ids)))
+        finally:
+            self.draining = False
+
+
+def _get_cycle_message(key, calls):
+    method, model_name, env = key
+    node = (model_name, method.__name__)
+    result = (
+        "The updater method %s.%s was called more than %d times for the same "
+        "records" % (model_name, method.__name__, calls)
+    )
+    for cycle in get_onupdate_graph(env).cycles:
+        if node in cycle:
+            return "%s; it's in the cycle: %s" % (
+                result,
+                ", ".join("%s.%s" % other for other in cycle),
+            )
+    return (
+        "%s; it may be in a cycle of updaters which don't declare the fields "
+        "they write (see the argument `writes` of onupdate)" % result
+    )
+
+
+def _get_pending_rank(key):
+    method, model_name, env = key
+    return get_onupdate_graph(env).get_rank(model_name, method.__name__)
+
+
+@contextmanager
+def deferred_onupdate(env):
+    """Defer the updater methods triggered in the transaction of `env`.
+
+    Within the context, the updater methods (see `xoeuf.api.onupdate`:func:)
+    are not called on each create or write, they're queued instead.  A
+    method triggered several times for the same records is called once for
+    the union of them.
+
+    The queue is drained when leaving the context.  Only the updater methods
+    are deferred, stored computed fields are recomputed as usual::
+
+        with deferred_onupdate(self.env):
+            for _ in range(50):
+                records.write({'name': ...})  # updaters are called once
+
+    If an exception is raised within the context, the pending methods are
+    discarded.  Nested contexts are merged into the outermost one.
+
+    .. versionadded:: 2.6.0
+
+    """
+    cr = env.cr
+    if cr in _onupdate_queues:
+        yield _onupdate_queues[cr]
+        return
+    queue = _onupdate_queues[cr] = OnUpdateQueue()
+    try:
+        yield queue
+        queue.drain()
+    finally:
+        del _onupdate_queues[cr]
+
+
+# add :meth:`odoo.models.BaseModel._get_onupdate_changes`
+@api.multi
+def _get_onupdate_changes(self, vals):
+    """Return the ids of the records in ``self`` changed by writing `vals`.
+
+    The result maps the name of each field in `vals` which triggers updater
+    methods to the list of ids of the records whose value would change.
+    The current values of all those fields are read at once (as superuser,
+    the records may be written by a user who can't read them).
+
+    Company dependent fields are regarded as changed.  So are x2many fields,
+    unless they're written with the commands 3 to 6.
+
+    """
+    fields = [
+        self._fields[fname]
+        for fname in vals
+        if fname in self._fields and self._method_triggers[self._fields[fname]]
+    ]
+    if not fields or not self:
+        return {}
+    records = self.sudo()
+    compared = [field for field in fields if not field.company_dependent]
+    if compared:
+        records.read([field.name for field in compared], load="_classic_write")
+    cache = records.env.cache
+    result = {}
+    for field in fields:
+        changed = result[field.name] = []
+        for record in records:
+            try:
+                if field.company_dependent:
+                    raise KeyError(field.name)
+                old = cache.get(record, field)
+                if field.type in ("one2many", "many2many"):
+                    old = set(old)
+                    new = _get_x2many_ids(old, vals[field.name])
+                else:
+                    new = field.convert_to_cache(vals[field.name], record)
+            except (KeyError, TypeError, ValueError):
+                # Let write() deal with it, and regard it as a change.
+                changed.append(record.id)
+            else:
+                if old != new:
+                    changed.append(record.id)
+    return result
+
+
+def _get_x2many_ids(ids, commands):
+    # Return the set of ids of a x2many field after applying `commands` to
+    # `ids`.  Commands which create or write the records of the comodel can't
+    # be compared without them, ValueError is raised instead.
+    result = set(ids)
+    for command in commands:
+        if command[0] == 3:
+            result.discard(command[1])
+        elif command[0] == 4:
+            result.add(command[1])
+        elif command[0] == 5:
+            result.clear()
+        elif command[0] == 6:
+            result = set(command[2])
+        else:
+            raise ValueError(command)
+    return result
+
+
+models.BaseModel._get_onupdate_changes = _get_onupdate_changes
+
+
+# The records written in each cursor whose fields `write` triggers by itself:
+# a map from ``(model_name, field_name)`` to a Counter of ids (the number of
+# nested writes of them).
+_onupdate_handled = WeakKeyDictionary()
+
+
+# extend :meth:`odoo.models.BaseModel.write`
+super_write = models.BaseModel.write
+
+
+@api.multi
+def write(self, vals):
+    changes = self._get_onupdate_changes(vals)
+    if not changes:
+        return super_write(self, vals)
+    handled = _onupdate_handled.setdefault(self.env.cr, {})
+    ids = Counter(set(self.ids))
+    for fname in changes:
+        handled.setdefault((self._name, fname), Counter()).update(ids)
+    try:
+        res = super_write(self, vals)
+    finally:
+        for fname in changes:
+            # Counter's `-=` drops the ids which are no longer written.
+            handled[(self._name, fname)] -= ids
+    # trigger the updater methods only for the records actually changed,
+    # with a single call for the fields which changed in the same records.
+    fnames = defaultdict(list)
+    for fname, changed in changes.items():
+        if changed:
+            fnames[tuple(changed)].append(fname)
+    for changed, group in fnames.items():
+        self.browse(changed).execute_onupdate(group)
+    return res
+
+
+models.BaseModel.write = write
+
+
 # extend :meth:`odoo.models.BaseModel._validate_fields`
 super_validate_fields = models.BaseModel._validate_fields
 
@@ -286,33 +887,94 @@ def iter_descendant_models(
 
     .. versionadded:: 1.2.0
 
+    .. versionchanged:: 2.6.0 The names of the models are cached in the
+       registry, see `get_descendant_model_names`:func:.
+
+    """
+    modelnames, _ = _get_descendant_model_names(
+        pool_or_env,
+        modelnames,
+        find_inherited=find_inherited,
+        find_delegated=find_delegated,
+        allow_abstract=allow_abstract,
+        allow_transient=allow_transient,
+    )
+    for modelname in modelnames:
+        yield modelname, pool_or_env[modelname]
+
+
+def get_descendant_model_names(
+    pool_or_env,
+    modelnames,
+    find_inherited=True,
+    find_delegated=True,
+    allow_abstract=False,
+    allow_transient=False,
+):
+    """Return the frozenset of the names of the models inheriting from others.
+
+    The arguments are the same as in `iter_descendant_models`:func:.  The
+    result is cached in the registry until its models are set up again.
+
+    .. versionadded:: 2.6.0
+
     """
+    _, result = _get_descendant_model_names(
+        pool_or_env,
+        modelnames,
+        find_inherited=find_inherited,
+        find_delegated=find_delegated,
+        allow_abstract=allow_abstract,
+        allow_transient=allow_transient,
+    )
+    return result
 
-    def _yield_all():
+
+def _get_descendant_model_names(
+    pool_or_env,
+    modelnames,
+    find_inherited=True,
+    find_delegated=True,
+    allow_abstract=False,
+    allow_transient=False,
+):
+    # Return the names of descendant models both as a tuple (in the order of
+    # the registry) and as a frozenset.
+    if isinstance(pool_or_env, api.Environment):
+        pool = pool_or_env.registry
+    else:
+        pool = pool_or_env
+    # `modelnames` may be an iterator, it's consumed once.
+    modelnames = tuple(modelnames)
+    key = (
+        modelnames,
+        find_inherited,
+        find_delegated,
+        allow_abstract,
+        allow_transient,
+    )
+    cache = getattr(pool, "_descendant_models", None)
+    if cache is None:
+        cache = pool._descendant_models = {}
+    result = cache.get(key)
+    if result is None:
         kinds = ()
         if find_inherited:
             kinds += ("_inherit",)
         if find_delegated:
             kinds += ("_inherits",)
-        if isinstance(pool_or_env, api.Environment):
-            pool = pool_or_env.registry
-        else:
-            pool = pool_or_env
-        for modelname in pool.descendants(modelnames, *kinds):
-            model = pool_or_env[modelname]
-            yield modelname, model
-
-    def _filter_abstract(models):
-        for modelname, model in models:
-            if not model._abstract or allow_abstract:
-                yield modelname, model
-
-    def _filter_transient(models):
-        for modelname, model in models:
-            if not model._transient or allow_transient:
-                yield modelname, model
-
-    yield from _filter_transient(_filter_abstract(_yield_all()))
+        names = tuple(
+            modelname
+            for modelname in pool.descendants(modelnames, *kinds)
+            if (allow_abstract or not pool[modelname]._abstract)
+            if (allow_transient or not pool[modelname]._transient)
+        )
+        result = (names, frozenset(names))
+        # Don't cache empty results: they may be asked before the models are
+        # set up.
+        if names:
+            cache[key] = result
+    return result
 
 
 @api.model
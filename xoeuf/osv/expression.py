@@ -25,9 +25,24 @@ Additions and changes:
   for which we can't find the proof (we return False) which should be True;
   but if we return True, there's a proof.
 
+- `FrozenDomain`:class: is an immutable Domain.  The normal forms and the hash
+  of domains are computed once and cached.
+
+- The filters of `Domain.asfilter`:meth: are compiled once for all domains
+  which only differ in the values of their terms.  See
+  `set_filter_cache_size`:func:.
+
+- `Domain.explain`:meth: estimates the cost of searching with a domain.
+
 """
+import json
 import operator
-from itertools import chain
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from itertools import chain, repeat
+from numbers import Number
+from threading import Lock
+from weakref import WeakValueDictionary
 
 from xotl.tools.deprecation import deprecated
 from xotl.tools.objects import classproperty
@@ -70,6 +85,47 @@ def normalize_leaf(term):
     return term
 
 
+def _memoized(func):
+    """Make a property of Domain which is computed once.
+
+    The value is kept until the domain is modified.
+
+    """
+    name = func.__name__
+
+    @wraps(func)
+    def getter(self):
+        cache = self.__dict__.get("_cache")
+        if cache is None:
+            cache = self.__dict__["_cache"] = {}
+        try:
+            return cache[name]
+        except KeyError:
+            result = cache[name] = func(self)
+            return result
+
+    return property(getter)
+
+
+def _mutator(name):
+    method = getattr(list, name)
+
+    @wraps(method)
+    def mutate(self, *args, **kwargs):
+        self.__dict__.pop("_cache", None)
+        return method(self, *args, **kwargs)
+
+    return mutate
+
+
+def _immutable(name):
+    def mutate(self, *args, **kwargs):
+        raise TypeError("%s is immutable" % type(self).__name__)
+
+    mutate.__name__ = name
+    return mutate
+
+
 class Domain(list):
     """A predicate expressed as an Odoo domain.
 
@@ -82,8 +138,26 @@ class Domain(list):
 
     __ https://en.wikipedia.org/wiki/Liskov_substitution_principle
 
+    The normal forms (and the hash) of the domain are computed once, and
+    computed again only if the domain is modified.  They are kept as `frozen
+    <FrozenDomain>`:class: domains; the properties return (mutable) copies
+    of them.
+
     """
 
+    __setitem__ = _mutator("__setitem__")
+    __delitem__ = _mutator("__delitem__")
+    __iadd__ = _mutator("__iadd__")
+    __imul__ = _mutator("__imul__")
+    append = _mutator("append")
+    extend = _mutator("extend")
+    insert = _mutator("insert")
+    pop = _mutator("pop")
+    remove = _mutator("remove")
+    clear = _mutator("clear")
+    sort = _mutator("sort")
+    reverse = _mutator("reverse")
+
     def __init__(self, seq=None):
         # TODO: Can you do some sanity check to avoid common mistakes?  For
         # me, it's normal that I do ``Model.search(['field', '=', value])``
@@ -96,7 +170,7 @@ class Domain(list):
             seq = const_eval(seq)
         super(Domain, self).__init__(seq)
 
-    def implies(self, other):
+    def implies(self, other, *, single_valued=False):
         """Check if a domain implies another.
 
         For any two domains `A` and `B`, the following rules are always true:
@@ -106,9 +180,26 @@ class Domain(list):
         - ``A.implies(A | B)``.
         - ``not B.implies(A) == (A | B).implies(A)``
 
+        Terms of the same field are compared as the sets of values they
+        allow, so ``('x', '=', 5)`` implies ``('x', '>', 1)`` and ``('x',
+        'in', (1, 2))`` implies ``('x', 'in', (1, 2, 3))``.
+
+        If `single_valued` is True, the terms with equality, membership or
+        ordering operators also imply the terms with negative operators, like
+        ``('x', 'in', (1, 2))`` implies ``('x', '!=', 3)``.  This is only
+        valid if none of the fields in the domains is (or traverses) a x2many
+        field: a record with tags 1 and 3 matches ``('tag_ids', 'in', (1,
+        2))`` but not ``('tag_ids', '!=', 3)``.
+
+        .. versionchanged:: 2.6.0 Compare terms with different operators.
+           Add argument `single_valued`.
+
         """
-        other = DomainTree(Domain(other).second_normal_form)
-        return DomainTree(self.second_normal_form).implies(other)
+        if not isinstance(other, Domain):
+            other = Domain(other)
+        other = DomainTree(other._second_normal_form)
+        tree = DomainTree(self._second_normal_form, single_valued=single_valued)
+        return tree.implies(other)
 
     @classproperty
     def TRUE(cls):
@@ -120,6 +211,14 @@ class Domain(list):
         "The domain which is False.  Implemented as ``[(0, '=', 1)]``."
         return cls(this.TRUE_LEAF)
 
+    def freeze(self):
+        """Return a `FrozenDomain`:class: equal to this domain.
+
+        .. versionadded:: 2.6.0
+
+        """
+        return FrozenDomain(self)
+
     @property
     def first_normal_form(self):
         """The first normal form.
@@ -138,8 +237,14 @@ class Domain(list):
             >>> domain.first_normal_form
             ['&', ('field_y', 'not in', False), ('field_x', '!=', 'value')]
 
+        .. versionchanged:: 2.6.0 Computed without recursion.
+
         """
-        return Domain(this.normalize_domain(self))
+        return _thaw(self._first_normal_form)
+
+    @_memoized
+    def _first_normal_form(self):
+        return FrozenDomain(_iter_first_normal_form(self))
 
     @property
     def second_normal_form(self):
@@ -197,10 +302,15 @@ class Domain(list):
                 ('field_z', '>', 1)
             ]
 
+        .. versionchanged:: 2.6.0 Computed in a single pass without
+           recursion.
+
         """
-        res = self.first_normal_form
-        res = Domain((normalize_leaf(item) for item in res))
-        return res.distribute_not()
+        return _thaw(self._second_normal_form)
+
+    @_memoized
+    def _second_normal_form(self):
+        return FrozenDomain(_iter_second_normal_form(self))
 
     @property
     def simplified(self):
@@ -253,8 +363,58 @@ class Domain(list):
             >>> domain3.simplified
             ['&', ('field_x', 'in', (1,)), ('field_y', '!=', False)]
 
+        Equality and membership terms of the same field are merged in
+        disjunctions::
+
+            >>> domain4 = Domain([
+            ...     '|',
+            ...     '|',
+            ...     ('field_x', '=', 1),
+            ...     ('field_x', '=', 2),
+            ...     ('field_x', 'in', (3, 4)),
+            ... ])
+            >>> domain4.simplified
+            [('field_x', 'in', (1, 2, 3, 4))]
+
+        .. versionchanged:: 2.6.0 Merge equality and membership terms.
+
+        .. seealso:: `simplify`:meth:
+
         """
-        return DomainTree(self.second_normal_form).get_simplified_domain()
+        return _thaw(self._simplified)
+
+    @_memoized
+    def _simplified(self):
+        tree = DomainTree(self._second_normal_form)
+        return FrozenDomain(tree.get_simplified_domain())
+
+    def simplify(self, *, intersect=False):
+        """Return the `simplified`:attr: domain.
+
+        If `intersect` is True, the values of equality and membership terms of
+        the same field are also intersected in conjunctions::
+
+            >>> Domain([('x', 'in', (1, 2, 3)), ('x', 'in', (2, 3, 4))]).simplify(
+            ...     intersect=True
+            ... )
+            [('x', 'in', (2, 3))]
+
+        And when the terms of a field have no values in common (e.g ``('x',
+        '>', 5)`` and ``('x', '<', 3)``) the conjunction is `FALSE_LEAF`.
+        Terms are pruned as in `implies`:meth: with `single_valued`.
+
+        .. warning:: Only use `intersect` if none of the fields in the domain
+           is (or traverses) a x2many field.  For those ``('tag_ids', '=', 1)
+           & ('tag_ids', '=', 2)`` is not the same as ``('tag_ids', 'in',
+           ())``.
+
+        .. versionadded:: 2.6.0
+
+        """
+        if not intersect:
+            return self.simplified
+        tree = DomainTree(self._second_normal_form, single_valued=True)
+        return Domain(tree.get_simplified_domain())
 
     def distribute_not(self):
         """Return a new domain without `not` operators.
@@ -280,7 +440,7 @@ class Domain(list):
             ]
 
         """
-        return Domain(this.distribute_not(self.first_normal_form))
+        return Domain(this.distribute_not(self._first_normal_form))
 
     @crossmethod
     def AND(*domains):
@@ -290,7 +450,7 @@ class Domain(list):
 
         """
         return Domain(
-            this.AND([Domain(domain).second_normal_form for domain in domains])
+            this.AND([Domain(domain)._second_normal_form for domain in domains])
         )
 
     __and__ = __rand__ = AND
@@ -303,13 +463,13 @@ class Domain(list):
 
         """
         return Domain(
-            this.OR([Domain(domain).second_normal_form for domain in domains])
+            this.OR([Domain(domain)._second_normal_form for domain in domains])
         )
 
     __or__ = __ror__ = OR
 
     def __invert__(self):
-        return Domain(["!"] + self.second_normal_form)
+        return Domain(["!"] + self._second_normal_form)
 
     def __eq__(self, other):
         """Two domains are equivalent if both have similar DomainTree."""
@@ -318,14 +478,19 @@ class Domain(list):
         # the *same* predicate.  However, since this implementation only
         # yields True when both domains have the same hash, we can find a, b
         # such that a implies b and b implies a, but a != b.
-        other = Domain(other)
+        if not isinstance(other, Domain):
+            other = Domain(other)
         return hash(self) == hash(other)
 
     def __ne__(self, other):
         return not self == other
 
     def __hash__(self):
-        return hash(DomainTree(self.second_normal_form))
+        return self._hash
+
+    @_memoized
+    def _hash(self):
+        return hash(DomainTree(self._second_normal_form))
 
     def asfilter(self, this="this", *, convert_false=True, convert_none=False):
         """Return a callable which is equivalent to the domain.
@@ -391,47 +556,148 @@ class Domain(list):
 
         .. versionchanged:: 0.82.0 Add parameters `convert_false` and `convert_none`.
 
+        .. versionchanged:: 2.6.0 The lambda is compiled once for all domains
+           which only differ in the values of their terms.  See
+           `set_filter_cache_size`:func:.
+
         """
-        return eval(
-            compile(
-                self._get_filter_ast(
-                    this, convert_false=convert_false, convert_none=convert_none
-                ),
-                "<domain>",
-                "eval",
-            )
+        key, params, items = self._get_filter_template(
+            this, convert_false=convert_false, convert_none=convert_none
         )
+        template = _filter_cache.get(
+            key,
+            lambda: _compile_filter_template(
+                items,
+                this,
+                len(params),
+                convert_false=convert_false,
+                convert_none=convert_none,
+            ),
+        )
+        return template(*params)
+
+    def _get_filter_template(self, this, *, convert_false, convert_none):
+        """Replace the values in the terms of the domain by parameters.
+
+        Return a tuple of `(key, params, items)`.  The `key` is the same for
+        all domains which only differ in the values of their terms.  `params`
+        is the list of the values, and `items` is the walk of the domain where
+        values are replaced by `_Param`:class: instances.
+
+        Values False and None are not replaced, because they change the
+        filter (see `convert_false` and `convert_none` in `asfilter`:meth:).
+
+        """
+        shape = [this, convert_false, convert_none]
+        params = []
+        items = []
+        for kind, term in self.walk():
+            if kind == KIND_TERM:
+                fieldname, op, value = term
+                if value is False or value is None:
+                    shape.append((fieldname, op, _LITERAL, value))
+                else:
+                    shape.append((fieldname, op))
+                    if op in ("in", "not in"):
+                        value = [x for x in value if x != False]  # noqa
+                    term = (fieldname, op, _Param("_%s%d" % (this, len(params))))
+                    params.append(value)
+            else:
+                shape.append(term)
+            items.append((kind, term))
+        return tuple(shape), params, items
 
     def _get_filter_ast(self, this="this", *, convert_false=True, convert_none=False):
         """Get compilable AST of the lambda obtained by `get_filter`:func:."""
+        node = _get_filter_body(
+            self.walk(), this, convert_false=convert_false, convert_none=convert_none
+        )
+        fn = ql.ensure_compilable(
+            ql.Expression(ql.Lambda(ql.make_arguments(this), node))
+        )
+        return fn
+
+    def asbatchfilter(self, records, *, convert_false=True, convert_none=False):
+        """Return the `records` which match the domain.
+
+        The result is the same as ``records.filtered(domain.asfilter())``, but
+        instead of evaluating the domain record by record, the fields in the
+        domain are read once for all the records (one read per level of
+        traversal in fields like ``('order_id.line_ids.state', ...)``).  Then
+        each term is evaluated once per record it reaches.
+
+        The keyword arguments are the same as in `asfilter`:meth:.
+
+        .. versionadded:: 2.6.0
+
+        """
+        if not records:
+            return records
+        options = dict(convert_false=convert_false, convert_none=convert_none)
+        reader = _BatchReader(records)
+        reader.prefetch(term[0] for kind, term in self.walk() if kind == KIND_TERM)
         stack = []
         for kind, term in self.walk():
             if kind == KIND_TERM:
                 fieldname, op, value = term
-                constructor = _TERM_CONSTRUCTOR[op]
-                stack.append(
-                    constructor(
-                        this,
-                        fieldname,
-                        value,
-                        convert_false=convert_false,
-                        convert_none=convert_none,
-                    )
-                )
-            else:
-                assert kind == KIND_OPERATOR
-                if term in BINARY_OPERATORS:
-                    args = (stack.pop(), stack.pop())
+                if isinstance(fieldname, str):
+                    *path, fieldname = fieldname.split(".")
                 else:
-                    args = (stack.pop(),)
-                constructor = _TERM_CONSTRUCTOR[term]
-                stack.append(constructor(*args))
-        node = stack.pop()
+                    path = ()
+                predicate = Domain([(fieldname, op, value)]).asfilter(**options)
+                stack.append(reader.match(tuple(path), predicate))
+            elif term == this.NOT_OPERATOR:
+                stack.append(reader.ids - stack.pop())
+            elif term == this.AND_OPERATOR:
+                stack.append(stack.pop() & stack.pop())
+            else:
+                assert term == this.OR_OPERATOR
+                stack.append(stack.pop() | stack.pop())
+        matched = stack.pop()
         assert not stack, "Remaining nodes in the stack: {}".format(stack)
-        fn = ql.ensure_compilable(
-            ql.Expression(ql.Lambda(ql.make_arguments(this), node))
+        return records.browse([id for id in records.ids if id in matched])
+
+    def explain(self, model, *, cache=True):
+        """Return the query plan of searching `model` with the domain.
+
+        Build the SQL query with the same machinery ``model.search()`` uses
+        (including record rules and the 'active' field) and ask PostgreSQL to
+        ``EXPLAIN`` it.  The query is not executed.
+
+        Return a `DomainPlan`:class:.  Its `warnings` is the list of pairs
+        ``(term, reason)`` where `reason` is either:
+
+        - ``'unindexed'``, the term tests a stored field without index.
+
+        - ``'subquery'``, the term traverses a relational field (e.g
+          ``('partner_id.name', ...)``), Odoo issues another query for it.
+
+        The plans are cached per model, user, context and shape of the domain
+        (domains which only differ in the values of their terms share the
+        plan).  Pass `cache` False to get a fresh plan.
+
+        .. note:: The queries needed to traverse relational fields are
+           executed; only the final query is explained.
+
+        .. versionadded:: 2.6.0
+
+        """
+        env = model.env
+        key, _params, _items = self._get_filter_template(
+            "this", convert_false=True, convert_none=False
         )
-        return fn
+        key = (
+            env.cr.dbname,
+            env.uid,
+            model._name,
+            bool(env.context.get("active_test", True)),
+            _get_context_key(env.context),
+            key,
+        )
+        if not cache:
+            _plan_cache.clear(key)
+        plan = _plan_cache.get(key, lambda: _explain(self, model))
+        return plan._replace(warnings=_get_plan_warnings(self, model))
 
     def walk(self):
         """Performs a post-fix walk of the domain's second normal form.
@@ -457,31 +723,181 @@ class Domain(list):
         """
         # Since the only operators we have in 2NF are AND and OR the postfix is simply
         # the reversed prefix notation of domains.
-        for term in reversed(self.second_normal_form):
+        for term in reversed(self._second_normal_form):
             if this.is_leaf(term):
                 yield "TERM", term
             else:
                 yield "OPERATOR", term
 
 
+def _thaw(domain):
+    # Return a mutable copy of the frozen `domain`, it shares the cached forms
+    # until it's modified.
+    result = Domain(domain)
+    result.__dict__["_cache"] = domain.__dict__.setdefault("_cache", {})
+    return result
+
+
+class FrozenDomain(Domain):
+    """An immutable `Domain`:class:.
+
+    Any attempt to modify a frozen domain raises a TypeError.  The normal
+    forms of domains are frozen, so that they can be safely cached.
+
+    .. versionadded:: 2.6.0
+
+    """
+
+    __setitem__ = _immutable("__setitem__")
+    __delitem__ = _immutable("__delitem__")
+    __iadd__ = _immutable("__iadd__")
+    __imul__ = _immutable("__imul__")
+    append = _immutable("append")
+    extend = _immutable("extend")
+    insert = _immutable("insert")
+    pop = _immutable("pop")
+    remove = _immutable("remove")
+    clear = _immutable("clear")
+    sort = _immutable("sort")
+    reverse = _immutable("reverse")
+
+    def freeze(self):
+        return self
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+
+class _BatchReader(object):
+    """Read the fields of records for `Domain.asbatchfilter`:meth:.
+
+    The records reached by each path of fields are kept by levels: the
+    level ``('order_id', 'line_ids')`` contains all the lines of the orders
+    of the records.
+
+    """
+
+    def __init__(self, records):
+        self.ids = set(records.ids)
+        self.levels = {(): records}
+
+    def prefetch(self, fieldnames):
+        """Read the fields (e.g ``'order_id.line_ids.state'``) in `fieldnames`.
+
+        Each level is read with a single call to ``read()``.
+
+        """
+        needed = {}
+        for fieldname in fieldnames:
+            if isinstance(fieldname, str):
+                path = tuple(fieldname.split("."))
+                for depth in range(len(path)):
+                    needed.setdefault(path[:depth], set()).add(path[depth])
+        for prefix in sorted(needed, key=len):
+            records = self.levels[prefix]
+            fnames = needed[prefix]
+            records.read(list(fnames), load="_classic_write")
+            for fname in fnames:
+                if prefix + (fname,) in needed:
+                    self.levels[prefix + (fname,)] = records.mapped(fname)
+
+    def match(self, path, predicate):
+        """Return the ids of the records for which `predicate` is True.
+
+        The `predicate` is applied to the records at the level `path`.  A
+        record matches if any of the records it reaches in that level does.
+
+        """
+        matched = {record.id for record in self.levels[path] if predicate(record)}
+        for depth in reversed(range(len(path))):
+            fname = path[depth]
+            matched = {
+                record.id
+                for record in self.levels[path[:depth]]
+                if not matched.isdisjoint(record[fname].ids)
+            }
+        return matched
+
+
+def _get_type_key(value):
+    """Return the type of `value` (and of its items if it's a collection)."""
+    if isinstance(value, (tuple, list)):
+        return type(value), tuple(_get_type_key(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return type(value), frozenset(_get_type_key(item) for item in value)
+    else:
+        return type(value)
+
+
 class DomainTerm(object):
-    def __init__(self, term):
+    """A term (leaf or operator) of a domain.
+
+    Terms are interned: all the terms with the same normal form (and the same
+    types of values) are the same object, so equality is an identity check.
+    The `original` term is the first one seen with that normal form.  Terms
+    with unhashable values (e.g nested lists) are not interned.
+
+    .. versionchanged:: 2.6.0 Terms are interned.
+
+    """
+
+    __slots__ = (
+        "original",
+        "normalized",
+        "left",
+        "operator",
+        "right",
+        "is_leaf",
+        "is_operator",
+        "_hash",
+        "_constraint",
+        "__weakref__",
+    )
+
+    _interned = WeakValueDictionary()
+
+    def __new__(cls, term):
         if isinstance(term, DomainTerm):
-            term = term.original
+            return term
+        normalized = normalize_leaf(term)
+        # The types of the value are part of the key, so that ('x', '=', True)
+        # is not taken for ('x', '=', 1), nor ('x', 'in', (True,)) for ('x',
+        # 'in', (1,)).
+        if this.is_leaf(normalized):
+            key = (normalized, _get_type_key(normalized[2]))
+        else:
+            key = (normalized, None)
+        try:
+            self = cls._interned.get(key)
+        except TypeError:
+            return cls._make(term, normalized, interned=False)
+        if self is None:
+            self = cls._make(term, normalized, interned=True)
+            self = cls._interned.setdefault(key, self)
+        return self
+
+    @classmethod
+    def _make(cls, term, normalized, interned):
+        self = super().__new__(cls)
         self.original = term
-        term = normalize_leaf(term)
-        self.normalized = term
-        if this.is_operator(term):
+        self.normalized = normalized
+        if this.is_operator(normalized):
             self.is_operator = True
-            self.operator = term
+            self.operator = normalized
             self.is_leaf = self.left = self.right = False
-        elif this.is_leaf(term):
+        elif this.is_leaf(normalized):
             self.is_operator = False
             self.is_leaf = True
-            self.left, self.operator, self.right = term
+            self.left, self.operator, self.right = normalized
         else:
             # TODO: May be a # TypeError.
             raise ValueError("Invalid domain term %r" % (term,))
+        self._hash = hash(normalized) if interned else None
+        self._constraint = _Constraint.from_term(self) if self.is_leaf else None
+        return self
+
+    def __reduce__(self):
+        return type(self), (self.original,)
 
     def __getitem__(self, x):
         if self.is_leaf:
@@ -492,7 +908,10 @@ class DomainTerm(object):
     def __eq__(self, other):
         if not isinstance(other, DomainTerm):
             other = DomainTerm(other)
-        return hash(self) == hash(other)
+        if self._hash is None or other._hash is None:
+            # Not interned.
+            return self.normalized == other.normalized
+        return self is other
 
     def __ne__(self, other):
         return not self == other
@@ -521,7 +940,14 @@ class DomainTerm(object):
         "not ilike": lambda x, y: y.lower().find(x.lower()) >= 0,
     }
 
-    def implies(self, other):
+    def implies(self, other, *, single_valued=False):
+        """Check if the term implies `other`.
+
+        See `Domain.implies`:meth: for the meaning of `single_valued`.
+
+        .. versionchanged:: 2.6.0 Compare terms with different operators.
+
+        """
         other = DomainTerm(other)
         # equals terms are implied.
         if self == other:
@@ -532,19 +958,31 @@ class DomainTerm(object):
         elif self.is_operator:
             # & => &
             return self.operator == other.operator
-        else:
-            # (x = 1)  => (x = 1)
-            # (x > 1) => (x > 0)
-            # (x in (1,2,3)) => (x in (1,2,3,4))
-            if self.operator == other.operator:
-                compare = self.operators_implication.get(other.operator)
-                return compare(self.right, other.right) if compare else False
-            else:
-                # TODO: x = 1  implies x != 2; x = 2 1 implies x > 1
-                return False
+        # (x = 1)  => (x = 1)
+        # (x > 1) => (x > 0)
+        # (x in (1,2,3)) => (x in (1,2,3,4))
+        if self.operator == other.operator:
+            compare = self.operators_implication.get(other.operator)
+            if compare and compare(self.right, other.right):
+                return True
+        # (x = 2) => (x > 1); (x in (1, 2)) => (x != 3)
+        mine, theirs = self._constraint, other._constraint
+        if mine is None or theirs is None:
+            return False
+        elif theirs.null and not mine.null and not single_valued:
+            # For x2many fields negative operators mean 'none of the related
+            # records', so (tag_ids = 1) doesn't imply (tag_ids != 2).
+            return False
+        try:
+            return mine.issubset(theirs)
+        except TypeError:
+            return False
 
     def __hash__(self):
-        return hash(self.normalized)
+        if self._hash is None:
+            # Not interned, this raises TypeError.
+            return hash(self.normalized)
+        return self._hash
 
 
 class DomainTree(object):
@@ -585,61 +1023,205 @@ class DomainTree(object):
 
     .. warning:: The domain must be in the second normal form.
 
+    .. versionchanged:: 2.6.0 The `domain` is not modified.  Add the
+       `single_valued` argument (see `Domain.implies`:meth: and
+       `Domain.simplify`:meth:).  The tree is built without recursion.
+
     """
 
-    def __init__(self, domain, parent=None):
-        term = domain.pop(0)
-        self.term = DomainTerm(term)
-        self.parent = parent
-        if term in this.DOMAIN_OPERATORS:
-            count = 2  # minimum number of operand in an operation.
-            children = set()
-            while count:
-                if domain[0] == term:
-                    count += 1
-                    domain.pop(0)
-                else:
-                    child = DomainTree(domain, self)
-                    # A & ((B & C) | A) should be simplified as A & B & C
-                    if child.term == self.term:
-                        children |= child.children
-                    else:
-                        children.add(child)
-                    count -= 1
-            # if a tree node have only one child it be come into it child.
-            if len(children) == 1:
-                child = children.pop()
-                self.term = child.term
-                self.children = child.children
+    __slots__ = ("term", "original", "parent", "single_valued", "children", "_hash")
+
+    def __init__(self, domain, parent=None, *, single_valued=False):
+        # The tree is built without recursion, so that deeply nested domains
+        # don't exceed the recursion limit.  Each item in the stack is an
+        # operator node waiting for `count` operands.
+        if not isinstance(domain, (list, tuple)):
+            domain = list(domain)
+        tokens = iter(domain)
+        self._setup(next(tokens), parent, single_valued)
+        stack = []
+        if self.term.is_operator:
+            stack.append([self, 2])  # minimum number of operand in an operation.
+        else:
+            self._simplify()
+        while stack:
+            item = stack[-1]
+            node, count = item
+            if not count:
+                stack.pop()
+                node._finish()
+                if stack:
+                    stack[-1][0]._add(node)
+                continue
+            token = next(tokens)
+            if token == node.term.original:
+                item[1] += 1
+                continue
+            item[1] -= 1
+            child = DomainTree.__new__(DomainTree)
+            child._setup(token, node, single_valued)
+            if child.term.is_operator:
+                stack.append([child, 2])
             else:
-                self.children = children
+                child._simplify()
+                node._add(child)
+
+    def _setup(self, token, parent, single_valued):
+        self.term = DomainTerm(token)
+        # The term as given, it's used in the output.
+        self.original = token.original if isinstance(token, DomainTerm) else token
+        self.parent = parent
+        self.single_valued = single_valued
+        self.children = set()
+        self._hash = None
+
+    def _add(self, child):
+        # A & ((B & C) | A) should be simplified as A & B & C
+        if child.term == self.term:
+            self.children |= child.children
         else:
-            self.children = set()
+            self.children.add(child)
+
+    def _finish(self):
+        # if a tree node have only one child it be come into it child.
+        if len(self.children) == 1:
+            child = self.children.pop()
+            self.term = child.term
+            self.original = child.original
+            self.children = child.children
         self._simplify()
 
     @property
     def is_operator(self):
-        return self.term in this.DOMAIN_OPERATORS
+        return self.term.is_operator
 
     @property
     def is_leaf(self):
         return not self.is_operator
 
     def _simplify(self):
-        """Remove redundant branches."""
-        for child in set(self.children):
-            if self.term == this.AND_OPERATOR:
-                # If current `child` is implied by any other ignore it.
-                func = lambda x, y: y.implies(x)
+        """Remove redundant branches.
+
+        Leaves can only imply leaves with the same field, so leaves are
+        compared only within those buckets.  Branches are compared with all
+        children.
+
+        """
+        if self.children:
+            self._merge()
+        if self.term.normalized == this.AND_OPERATOR:
+            # If current `child` is implied by any other ignore it.
+            func = lambda x, y: y.implies(x)
+            strongest = True
+        else:
+            # If current `child` implies any other ignore it.
+            func = lambda x, y: x.implies(y)
+            strongest = False
+        buckets = {}
+        branches = []
+        for child in self.children:
+            if child.is_leaf:
+                buckets.setdefault(child.term.left, []).append(child)
             else:
-                # If current `child` implies any other ignore it.
-                func = lambda x, y: x.implies(y)
-            if any(func(child, y) for y in self.children - {child}):
-                self.children.remove(child)
+                branches.append(child)
+        if branches or len(buckets) < len(self.children):
+            leaves = []
+            for bucket in buckets.values():
+                leaves.extend(_prune(bucket, func, strongest))
+            children = set(leaves)
+            children.update(branches)
+            for child in branches + leaves:
+                others = branches if child.is_leaf else list(children)
+                if any(
+                    func(child, y) for y in others if y is not child and y in children
+                ):
+                    children.remove(child)
+            self.children = children
         if len(self.children) == 1:
             _self = self.children.pop()
             self.children = _self.children
             self.term = _self.term
+            self.original = _self.original
+
+    def _merge(self):
+        """Merge the equality and membership terms on the same field.
+
+        In an OR the values of '=' and 'in' terms are joined.  In an AND the
+        values of '!=' and 'not in' terms are joined.  If `single_valued`,
+        the values of '=' and 'in' terms in an AND are intersected; and if
+        the terms of a field allow no value the AND is False.
+
+        """
+        conjunction = self.term.normalized == this.AND_OPERATOR
+        if conjunction and self.single_valued and self._is_contradiction():
+            self._make_false()
+            return
+        groups = {}
+        for child in self.children:
+            if child.is_leaf:
+                positive = child.term.operator in ("=", "in")
+                if positive and conjunction and not self.single_valued:
+                    continue
+                elif not positive and not conjunction:
+                    continue
+                values = _get_mergeable_values(
+                    child.term, strings=positive and not conjunction
+                )
+                if values is not None:
+                    # Strings and ids are not merged: Odoo searches by name
+                    # only if all the values are strings.
+                    strings = any(isinstance(value, str) for value in values)
+                    key = (child.term.left, positive, strings)
+                    groups.setdefault(key, []).append((child, values))
+        for (left, positive, _), group in groups.items():
+            if len(group) < 2:
+                continue
+            children, values = zip(*group)
+            if positive and conjunction:
+                values = frozenset.intersection(*values)
+                if not values:
+                    self._make_false()
+                    return
+            else:
+                values = frozenset.union(*values)
+            self.children.difference_update(children)
+            term = (left, "in" if positive else "not in", _sorted_values(values))
+            self.children.add(
+                DomainTree([term], parent=self, single_valued=self.single_valued)
+            )
+        if self.single_valued:
+            falses = {child for child in self.children if child.is_false}
+            if falses and conjunction:
+                self._make_false()
+            elif falses and falses != self.children:
+                self.children -= falses
+
+    def _is_contradiction(self):
+        """Check if the leaves of a field allow no value (in an AND)."""
+        constraints = {}
+        for child in self.children:
+            constraint = child.term._constraint if child.is_leaf else None
+            if constraint is not None:
+                left = child.term.left
+                previous = constraints.get(left)
+                try:
+                    if previous is not None:
+                        constraint = previous.intersection(constraint)
+                    if constraint.is_empty():
+                        return True
+                except TypeError:
+                    continue  # Not comparable values.
+                constraints[left] = constraint
+        return False
+
+    def _make_false(self):
+        self.term = DomainTerm(this.FALSE_LEAF)
+        self.original = this.FALSE_LEAF
+        self.children = set()
+
+    @property
+    def is_false(self):
+        return self.term.normalized == this.FALSE_LEAF
 
     @property
     def sorted_children(self):
@@ -647,17 +1229,17 @@ class DomainTree(object):
         return sorted(self.children, key=lambda item: hash(item))
 
     def get_simplified_domain(self):
-        if self.parent:
-            res = Domain(self.term.original for x in range(1, len(self.children) or 2))
-        elif self.is_leaf:
-            res = Domain([self.term.original])
-        else:
-            # Initials `&` aren't needed.
-            res = Domain([self.term.original] if self.term == this.OR_OPERATOR else [])
-        if not self.is_leaf:
-            res.extend(
-                chain(*(x.get_simplified_domain() for x in self.sorted_children))
-            )
+        res = Domain()
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            if node.is_leaf:
+                res.append(node.original)
+            else:
+                # Initials `&` aren't needed.
+                if node is not self or node.term.normalized == this.OR_OPERATOR:
+                    res.extend(repeat(node.term.normalized, len(node.children) - 1))
+                pending.extend(reversed(node.sorted_children))
         return res
 
     def __repr__(self):
@@ -682,31 +1264,47 @@ class DomainTree(object):
         return not self == other
 
     def implies(self, other):
-        funct = all if other.term == this.AND_OPERATOR else any
+        return self._implies(other, _IMPLIES_DEPTH, [_IMPLIES_BUDGET])
+
+    def _implies(self, other, depth, budget):
+        # The search is bounded by `depth` and the number of comparisons in
+        # `budget`; beyond those we don't find the proof (false negatives
+        # are allowed).
+        budget[0] -= 1
+        if budget[0] < 0:
+            return False
+        funct = all if other.term.normalized == this.AND_OPERATOR else any
         if self.is_leaf:
             # A => A
-            if self.term.implies(other.term):
+            if self.term.implies(other.term, single_valued=self.single_valued):
                 return True
             # A => A | B
-            if other.is_operator and funct(
-                self.implies(child) for child in other.sorted_children
+            if (
+                depth
+                and other.is_operator
+                and funct(self._implies(c, depth - 1, budget) for c in other.children)
             ):
                 return True
-        elif self.is_operator:
-            funct2 = any if self.term == this.AND_OPERATOR else all
+        elif depth:
+            depth -= 1
+            funct2 = any if self.term.normalized == this.AND_OPERATOR else all
             # A & B => A
-            if funct2(child.implies(other) for child in self.sorted_children):
+            if funct2(child._implies(other, depth, budget) for child in self.children):
                 return True
             # A & B => A | B
             if funct(
-                funct2(child.implies(other_child) for child in self.sorted_children)
-                for other_child in other.sorted_children
+                funct2(child._implies(oc, depth, budget) for child in self.children)
+                for oc in other.children
             ):
                 return True
         return False
 
     def __hash__(self):
-        return hash(tuple([self.term] + self.sorted_children))
+        # Nodes are not modified after they are added to their parent, and
+        # the children have already computed their hash.
+        if self._hash is None:
+            self._hash = hash(tuple([self.term] + self.sorted_children))
+        return self._hash
 
     @deprecated("Domain.walk()")
     def walk(self):
@@ -740,7 +1338,7 @@ class DomainTree(object):
 
         """
         if self.is_leaf:
-            yield (KIND_TERM, self.term.original)
+            yield (KIND_TERM, self.original)
         else:
             for which in self.children:
                 for what in which.walk():
@@ -753,6 +1351,378 @@ class DomainTree(object):
                     yield (KIND_OPERATOR, self.term)
 
 
+def _iter_first_normal_form(domain):
+    """Yield the terms of the first normal form of `domain`.
+
+    This is the same as ``odoo.osv.expression.normalize_domain`` (without
+    inserting each implicit `&` at the beginning of a list).
+
+    """
+    if not domain:
+        yield this.TRUE_LEAF
+        return
+    # The expressions at the top-level are joined with `&`.
+    expressions = 0
+    expected = 1
+    for token in domain:
+        if expected == 0:
+            expressions += 1
+            expected = 1
+        if isinstance(token, (list, tuple)):
+            expected -= 1
+        else:
+            expected += _OPERATORS_ARITY.get(token, 0) - 1
+    assert expected == 0, "This domain is syntactically not correct: %s" % (domain,)
+    yield from repeat(this.AND_OPERATOR, expressions)
+    yield from domain
+
+
+def _iter_second_normal_form(domain):
+    """Yield the terms of the second normal form of `domain`.
+
+    This is the same as applying `normalize_leaf`:func: and
+    ``odoo.osv.expression.distribute_not`` to the first normal form, in a
+    single pass.
+
+    """
+    negations = [False]
+    for token in _iter_first_normal_form(domain):
+        negate = negations.pop()
+        if this.is_leaf(token):
+            token = normalize_leaf(token)
+            if not negate:
+                yield token
+            else:
+                left, operator, right = token
+                if operator in this.TERM_OPERATORS_NEGATION:
+                    yield (left, this.TERM_OPERATORS_NEGATION[operator], right)
+                else:
+                    yield this.NOT_OPERATOR
+                    yield token
+        elif token == this.NOT_OPERATOR:
+            negations.append(not negate)
+        elif token in this.DOMAIN_OPERATORS_NEGATION:
+            yield this.DOMAIN_OPERATORS_NEGATION[token] if negate else token
+            negations.append(negate)
+            negations.append(negate)
+        else:
+            yield token
+
+
+_OPERATORS_ARITY = {this.NOT_OPERATOR: 1, this.AND_OPERATOR: 2, this.OR_OPERATOR: 2}
+
+
+# Bounds of the search of `DomainTree.implies`:meth:.
+_IMPLIES_DEPTH = 64
+_IMPLIES_BUDGET = 10000
+
+
+def _get_mergeable_values(term, strings=True):
+    """Return the set of values of an (in)equality or membership `term`.
+
+    Return None if the term cannot be merged with others.  Values False, 0,
+    None and booleans have special meaning in Odoo's 'in', and string values
+    for many2one fields search by name ('in' uses 'ilike') if all the values
+    are strings.  So we don't merge terms with those values, nor '=' (or
+    '!=') with a string, nor terms with both strings and other values.
+
+    """
+    if term.operator in ("=", "!="):
+        if isinstance(term.right, str):
+            return None
+        values = (term.right,)
+    elif term.operator in ("in", "not in"):
+        values = term.right
+    else:
+        return None
+    kinds = set()
+    for value in values:
+        if value is None or isinstance(value, bool) or value == False:  # noqa
+            return None
+        if not strings and isinstance(value, str):
+            return None
+        kinds.add(isinstance(value, str))
+    if len(kinds) > 1:
+        return None
+    try:
+        return frozenset(values)
+    except TypeError:
+        return None
+
+
+def _sorted_values(values):
+    try:
+        return tuple(sorted(values))
+    except TypeError:
+        return tuple(sorted(values, key=repr))
+
+
+# For these operators `DomainTerm.implies`:meth: is a total order of the
+# values: ``(x > 2)`` implies ``(x > 1)``.  So the strongest term is the one
+# with greatest value.
+_STRONGEST = {">": max, ">=": max, "<": min, "<=": min}
+_WEAKEST = {">": min, ">=": min, "<": max, "<=": max}
+
+
+# ``(x in A)`` implies ``(x in B)`` if A is a subset of B; ``(x not in A)``
+# implies ``(x not in B)`` if B is a subset of A.  In an AND of 'in' terms,
+# the term with the smallest set is the strongest.
+_SUBSETS = {"in": True, "not in": False}
+
+
+def _prune_sets(leaves, minimal):
+    """Keep the leaves with minimal (or maximal) sets of values.
+
+    Sets are indexed by their values, so that only the sets which share
+    values are compared.
+
+    """
+    sets = [(leaf, frozenset(leaf.term.right)) for leaf in leaves]
+    sets.sort(key=lambda item: len(item[1]), reverse=not minimal)
+    if minimal and not sets[0][1]:
+        return [sets[0][0]]  # The empty set is a subset of any other.
+    result = []
+    index = {}
+    for leaf, values in sets:
+        if not values:
+            continue  # The empty set is a subset of the ones kept.
+        if minimal:
+            # Is any kept set a subset of values?
+            hits = {}
+            for value in values:
+                for pos in index.get(value, ()):
+                    hits[pos] = hits.get(pos, 0) + 1
+            redundant = any(count == len(result[pos][1]) for pos, count in hits.items())
+        else:
+            # Is values a subset of any kept set?
+            candidates = None
+            for value in values:
+                found = index.get(value, set())
+                candidates = found if candidates is None else candidates & found
+                if not candidates:
+                    break
+            redundant = bool(candidates)
+        if not redundant:
+            for value in values:
+                index.setdefault(value, set()).add(len(result))
+            result.append((leaf, values))
+    return [leaf for leaf, _ in result]
+
+
+def _prune(leaves, implied, strongest):
+    """Remove the redundant `leaves` of the same field.
+
+    `implied(x, y)` must return True if `x` is redundant given `y`.  If
+    `strongest` is True (i.e in an AND) a leaf is redundant if implied by
+    another; otherwise (in an OR) if it implies another.
+
+    Leaves are first pruned among those with the same operator, then the
+    remaining ones are compared with the leaves of other operators.
+
+    """
+    if len(leaves) < 2:
+        return leaves
+    groups = {}
+    for leaf in leaves:
+        groups.setdefault(leaf.term.operator, []).append(leaf)
+    groups = {
+        op: _prune_operator(group, op, implied, strongest)
+        for op, group in groups.items()
+    }
+    if len(groups) < 2:
+        return next(iter(groups.values()))
+    result = []
+    removed = set()
+    for op, group in groups.items():
+        others = [other for key, other in groups.items() if key != op]
+        for leaf in group:
+            if any(
+                implied(leaf, other)
+                for other in chain.from_iterable(others)
+                if id(other) not in removed
+            ):
+                removed.add(id(leaf))
+            else:
+                result.append(leaf)
+    return result
+
+
+def _prune_operator(leaves, op, implied, strongest):
+    """Remove the redundant `leaves` of the same field and operator `op`."""
+    if len(leaves) < 2:
+        return leaves
+    try:
+        select = (_STRONGEST if strongest else _WEAKEST).get(op)
+        if select is not None:
+            return [select(leaves, key=lambda leaf: leaf.term.right)]
+        elif op in _SUBSETS:
+            return _prune_sets(leaves, minimal=_SUBSETS[op] == strongest)
+    except TypeError:
+        pass  # Not comparable (or hashable) values, compare them by pairs.
+    result = list(leaves)
+    for leaf in leaves:
+        if any(implied(leaf, other) for other in result if other is not leaf):
+            result.remove(leaf)
+    return result
+
+
+class _Constraint(object):
+    """The set of values a leaf term allows for its field.
+
+    A value (other than NULL) is allowed if it's in `values` (unless that's
+    None), not in `excluded` and between the bounds `lower` and `upper`
+    (pairs of ``(value, inclusive)``, or None).  NULL is allowed if `null`
+    is True.
+
+    Comparing values of different types may raise a TypeError.
+
+    """
+
+    __slots__ = ("values", "excluded", "lower", "upper", "null")
+
+    def __init__(
+        self, values=None, excluded=frozenset(), lower=None, upper=None, null=False
+    ):
+        self.values = values
+        self.excluded = excluded
+        self.lower = lower
+        self.upper = upper
+        self.null = null
+
+    @classmethod
+    def from_term(cls, term):
+        """Return the constraint of a `DomainTerm`:class: or None.
+
+        Only terms with numbers, dates and datetimes are converted: False and
+        0 are special in Odoo, and strings may be names of related records.
+
+        """
+        op, value = term.operator, term.right
+        if op in ("in", "not in"):
+            values = _get_constraint_values(value)
+        elif op in ("=", "!=", ">", ">=", "<", "<="):
+            values = _get_constraint_values((value,))
+        else:
+            return None
+        if values is None:
+            return None
+        elif op in ("=", "in"):
+            return cls(values=values)
+        elif op in ("!=", "not in"):
+            return cls(excluded=values, null=True)
+        elif op in (">", ">="):
+            return cls(lower=(value, op == ">="))
+        else:
+            return cls(upper=(value, op == "<="))
+
+    def allows(self, value):
+        """Check if the (not NULL) `value` is allowed."""
+        if self.values is not None and value not in self.values:
+            return False
+        elif value in self.excluded:
+            return False
+        if self.lower is not None:
+            bound, inclusive = self.lower
+            if value < bound or (value == bound and not inclusive):
+                return False
+        if self.upper is not None:
+            bound, inclusive = self.upper
+            if value > bound or (value == bound and not inclusive):
+                return False
+        return True
+
+    def issubset(self, other):
+        """Check if all the values allowed by self are allowed by `other`.
+
+        This can have false negatives (e.g for integers ``x > 1`` and ``x >=
+        2`` are the same) but not false positives.
+
+        """
+        if self.null and not other.null:
+            return False
+        elif self.values is not None:
+            return all(
+                other.allows(value) for value in self.values if self.allows(value)
+            )
+        elif other.values is not None:
+            return False  # An interval is not finite.
+        elif any(self.allows(value) for value in other.excluded):
+            return False
+        else:
+            return _is_tighter(self.lower, other.lower, operator.gt) and _is_tighter(
+                self.upper, other.upper, operator.lt
+            )
+
+    def intersection(self, other):
+        if self.values is None:
+            values = other.values
+        elif other.values is None:
+            values = self.values
+        else:
+            values = self.values & other.values
+        lower, upper = self.lower, self.upper
+        if not _is_tighter(lower, other.lower, operator.gt):
+            lower = other.lower
+        if not _is_tighter(upper, other.upper, operator.lt):
+            upper = other.upper
+        return type(self)(
+            values=values,
+            excluded=self.excluded | other.excluded,
+            lower=lower,
+            upper=upper,
+            null=self.null and other.null,
+        )
+
+    def is_empty(self):
+        """Check if no value is allowed.
+
+        This can have false negatives but not false positives.
+
+        """
+        if self.null:
+            return False
+        elif self.values is not None:
+            return not any(self.allows(value) for value in self.values)
+        elif self.lower is not None and self.upper is not None:
+            (lower, linclusive), (upper, uinclusive) = self.lower, self.upper
+            if lower == upper:
+                return not (linclusive and uinclusive) or lower in self.excluded
+            return lower > upper
+        else:
+            return False
+
+
+def _is_tighter(bound, other, cmp):
+    """Check if `bound` is at least as tight as `other`.
+
+    `cmp` is `operator.gt` for lower bounds and `operator.lt` for upper
+    bounds.
+
+    """
+    if other is None:
+        return True
+    elif bound is None:
+        return False
+    (value, inclusive), (other, other_inclusive) = bound, other
+    if value == other:
+        return other_inclusive or not inclusive
+    return cmp(value, other)
+
+
+def _get_constraint_values(values):
+    result = []
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (Number, datetime.date)):
+            return None
+        elif value == 0:
+            return None
+        result.append(value)
+    try:
+        return frozenset(result)
+    except TypeError:
+        return None
+
+
 # Exports AND and OR so that we can replace 'from odoo.
 def AND(domains):
     return Domain.AND(*domains)
@@ -762,16 +1732,290 @@ def OR(domains):
     return Domain.OR(*domains)
 
 
+def _get_filter_body(items, this, *, convert_false, convert_none):
+    """Return the AST of the body of a filter from the `items` of a walk."""
+    stack = []
+    for kind, term in items:
+        if kind == KIND_TERM:
+            fieldname, op, value = term
+            constructor = _TERM_CONSTRUCTOR[op]
+            stack.append(
+                constructor(
+                    this,
+                    fieldname,
+                    value,
+                    convert_false=convert_false,
+                    convert_none=convert_none,
+                )
+            )
+        else:
+            assert kind == KIND_OPERATOR
+            if term in BINARY_OPERATORS:
+                args = (stack.pop(), stack.pop())
+            else:
+                args = (stack.pop(),)
+            constructor = _TERM_CONSTRUCTOR[term]
+            stack.append(constructor(*args))
+    node = stack.pop()
+    assert not stack, "Remaining nodes in the stack: {}".format(stack)
+    return node
+
+
+def _compile_filter_template(items, this, params, *, convert_false, convert_none):
+    """Compile a function which takes the `params` and returns the filter.
+
+    The `items` are the result of `Domain._get_filter_template`:meth:.
+
+    """
+    node = _get_filter_body(
+        items, this, convert_false=convert_false, convert_none=convert_none
+    )
+    names = ["_%s%d" % (this, i) for i in range(params)]
+    fn = ql.ensure_compilable(
+        ql.Expression(
+            ql.Lambda(
+                ql.make_arguments(*names),
+                ql.Lambda(ql.make_arguments(this), node),
+            )
+        )
+    )
+    return eval(compile(fn, "<domain>", "eval"))
+
+
+class _Param(object):
+    """A parameter in place of the value of a term.  See `asfilter`."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+# Marks the values which are kept in the filter templates.
+_LITERAL = object()
+
+
+class FilterCache(object):
+    """A LRU cache of the compiled filter templates of `Domain.asfilter`:meth:.
+
+    .. versionadded:: 2.6.0
+
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.templates = OrderedDict()
+        self.hits = self.misses = 0
+        self._lock = Lock()
+
+    def get(self, key, compile):
+        """Get the template for `key`; call `compile` to make a new one."""
+        with self._lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+        template = compile()
+        with self._lock:
+            if self.maxsize:
+                self.templates[key] = template
+                self._shrink()
+        return template
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._shrink()
+
+    def clear(self, key=None):
+        with self._lock:
+            if key is None:
+                self.templates.clear()
+                self.hits = self.misses = 0
+            else:
+                self.templates.pop(key, None)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                size=len(self.templates),
+                maxsize=self.maxsize,
+            )
+
+    def _shrink(self):
+        while len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+
+
+_filter_cache = FilterCache()
+
+
+def set_filter_cache_size(maxsize):
+    """Set the maximum number of compiled filters kept by `Domain.asfilter`:meth:.
+
+    Set `maxsize` to 0 to disable the cache.  The default is 256.
+
+    .. versionadded:: 2.6.0
+
+    """
+    _filter_cache.resize(maxsize)
+
+
+def get_filter_cache_stats():
+    """Return the statistics of the cache of `Domain.asfilter`:meth:.
+
+    The result is dictionary with the keys 'hits', 'misses', 'size' (the
+    number of compiled filters) and 'maxsize'.
+
+    .. versionadded:: 2.6.0
+
+    """
+    return _filter_cache.get_stats()
+
+
+class _PlanCache(object):
+    """A LRU cache of the plans of `Domain.explain`:meth:."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.plans = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, explain):
+        """Get the plan for `key`; call `explain` to get a new one."""
+        with self._lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+                return plan
+        plan = explain()
+        with self._lock:
+            self.plans[key] = plan
+            while len(self.plans) > self.maxsize:
+                self.plans.popitem(last=False)
+        return plan
+
+    def clear(self, key=None):
+        with self._lock:
+            if key is None:
+                self.plans.clear()
+            else:
+                self.plans.pop(key, None)
+
+
+_plan_cache = _PlanCache()
+
+
+def _get_context_key(context):
+    """Return a hashable key of the items in `context`.
+
+    Any item may change the query (e.g 'lang' for translated fields, or
+    'force_company' in record rules), so we keep all of them.  Unhashable
+    values are keyed by their repr.
+
+    """
+    result = []
+    for name, value in context.items():
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
+        result.append((name, value))
+    return tuple(sorted(result, key=lambda item: str(item[0])))
+
+
+class DomainPlan(namedtuple("DomainPlan", "rows cost plan warnings")):
+    """The result of `Domain.explain`:meth:.
+
+    `rows` and `cost` are the estimated number of rows and total cost of the
+    query.  `plan` is the plan returned by ``EXPLAIN (FORMAT JSON)``.
+    `warnings` is a list of ``(term, reason)``.
+
+    .. versionadded:: 2.6.0
+
+    """
+
+    __slots__ = ()
+
+
+def _explain(domain, model):
+    query = model._where_calc(list(domain))
+    model._apply_ir_rules(query, "read")
+    from_clause, where_clause, params = query.get_sql()
+    sql = 'SELECT "%s".id FROM %s' % (model._table, from_clause)
+    if where_clause:
+        sql += " WHERE %s" % where_clause
+    cr = model.env.cr
+    cr.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    result = cr.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    plan = result[0]["Plan"]
+    return DomainPlan(
+        rows=plan["Plan Rows"],
+        cost=plan["Total Cost"],
+        plan=plan,
+        warnings=[],
+    )
+
+
+def _get_plan_warnings(domain, model):
+    result = []
+
+    def warn(term, reason):
+        if (term, reason) not in result:
+            result.append((term, reason))
+
+    for term in domain._second_normal_form:
+        if not this.is_leaf(term) or not isinstance(term[0], str):
+            continue
+        current = model
+        path = term[0].split(".")
+        for i, fname in enumerate(path):
+            field = current._fields.get(fname)
+            if field is None:
+                break
+            if fname != "id" and field.store and field.column_type and not field.index:
+                warn(term, "unindexed")
+            if i + 1 < len(path):
+                if not field.relational:
+                    break
+                if not getattr(field, "auto_join", False):
+                    warn(term, "subquery")
+                current = model.env[field.comodel_name]
+    return result
+
+
 def _constructor_not(node):
     return ql.UnaryOp(ql.Not(), node)
 
 
 def _constructor_and(*operands):
-    return ql.BoolOp(ql.And(), list(operands))
+    return ql.BoolOp(ql.And(), _flatten_operands(ql.And, operands))
 
 
 def _constructor_or(*operands):
-    return ql.BoolOp(ql.Or(), list(operands))
+    return ql.BoolOp(ql.Or(), _flatten_operands(ql.Or, operands))
+
+
+def _flatten_operands(op, operands):
+    # Long chains of the same operator become a single BoolOp; otherwise the
+    # AST would be as deep as the chain is long and the compiler would blow
+    # the stack.
+    result = []
+    for operand in operands:
+        if isinstance(operand, ql.BoolOp) and isinstance(operand.op, op):
+            result.extend(operand.values)
+        else:
+            result.append(operand)
+    return result
 
 
 def _get_mapped(node, fieldname):
@@ -912,7 +2156,8 @@ def _constructor_in(
     # Filtering False is the same Odoo does; which causes 0 to be removed
     # also.  See https://github.com/odoo/odoo/pull/31408
     assert qst in (ql.In, ql.NotIn)
-    value = [x for x in value if x != False]  # noqa
+    if not isinstance(value, _Param):  # parameters are already filtered
+        value = [x for x in value if x != False]  # noqa
     return _get_constructor(qst)(
         this, fieldname, value, convert_false=convert_false, convert_none=convert_none
     )
@@ -1030,6 +2275,8 @@ def _constructor_not_ilike(
 
 
 def _constructor_from_value(value):
+    if isinstance(value, _Param):
+        return ql.Name(value.name, ql.Load())
     expr = ql.parse(repr(value))
     return expr.body
 
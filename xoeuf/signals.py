@@ -10,35 +10,110 @@
 # This is the implementation of the signals.  The 'signals' module remains the
 # API but we're porting this to 'odoo.signals'.
 import logging
+import time
+from collections import OrderedDict, deque
 from functools import wraps
-from threading import RLock
+from operator import attrgetter
+from heapq import merge
+from threading import Lock, local
+from weakref import WeakKeyDictionary
 
-from expiringdict import ExpiringDict
-
-from odoo import api, models
+from odoo import api, models, sql_db
 
 from xotl.tools.objects import temp_attributes
-from xotl.tools.symbols import Unset
+from xoeuf.osv.expression import Domain, DomainTree
 from xotl.tools.future.contextlib import ExitStack, contextmanager
 
 
 logger = logging.getLogger(__name__)
 del logging
 
-_lock = RLock()
-_cache = ExpiringDict(max_len=100, max_age_seconds=10)
+# Maps DB names to a pair of `(generation, installed addons)`.  See
+# `get_installed_addons`:func:.
+_installed_addons = {}
 
 
 class HookDefinition(object):
+    # All the hook definitions.  Each one is assigned a bit in the bitmap
+    # returned by `_get_listeners`:func:.
+    definitions = []
+
+    # Incremented every time the hooks of any definition change.
+    _version = 0
+
     def __init__(self, action=None, doc=None):
-        self.hooks = []
+        # The dispatch table maps `(dbname, model name)` to tuples of
+        # `(generation, live hooks, field index, readonly)`.  See
+        # `live_hooks`:meth:.
+        self._dispatch = {}
+        self.bit = 1 << len(HookDefinition.definitions)
+        HookDefinition.definitions.append(self)
+        # The hooks are kept in `_registry` which maps lookup keys to pairs of
+        # `(sequence, hook)`.  The same pairs are indexed by sender in
+        # `_senders`; hooks for any sender are in the bucket of None.  The
+        # sequence keeps the order of connection when merging buckets.
+        self._registry = OrderedDict()
+        self._senders = {}
+        self._sequence = 0
         self.action = action
         self.__doc__ = doc
 
     def __repr__(self):
         return "<Signal(%r)>" % self.action
 
-    def connect(self, hook, sender=None, require_registry=True, framework=False):
+    @property
+    def hooks(self):
+        """The list of pairs `(lookup key, hook)` in order of connection.
+
+        Assigning a list of such pairs replaces all the hooks (e.g
+        `no_signals`:func:).
+
+        """
+        return [(_unwrap(key), hook) for key, (_, hook) in self._registry.items()]
+
+    @hooks.setter
+    def hooks(self, value):
+        self._registry.clear()
+        self._senders.clear()
+        for key, hook in value:
+            self._add(key, hook)
+        self._invalidate()
+
+    def _add(self, key, hook):
+        key = _hashable(key)
+        self._sequence += 1
+        item = self._registry[key] = (self._sequence, hook)
+        where = _hashable(hook.sender_id) if hook.sender else None
+        self._senders.setdefault(where, OrderedDict())[key] = item
+
+    def _remove(self, key):
+        key = _hashable(key)
+        item = self._registry.pop(key, None)
+        if item is not None:
+            _, hook = item
+            where = _hashable(hook.sender_id) if hook.sender else None
+            bucket = self._senders[where]
+            del bucket[key]
+            if not bucket:
+                del self._senders[where]
+
+    def _invalidate(self):
+        HookDefinition._version += 1
+        self._dispatch.clear()
+
+    def connect(
+        self,
+        hook,
+        sender=None,
+        require_registry=True,
+        framework=False,
+        deferred=None,
+        coalesce=False,
+        priority=0,
+        stop_on=None,
+        fields=None,
+        readonly=False,
+    ):
         """Connect hook.
 
         :param hook: A function or an instance method which is to receive
@@ -55,21 +130,57 @@ class HookDefinition(object):
         :keyword framework: Set to True to make this a `framework-level hook
                             <FrameworkHook>`:class:.
 
+        :keyword deferred: If set to 'commit' the hook is not called when the
+                 signal is sent, but after the cursor of the sender commits.
+                 See `set_deferred_executor`:func:.
+
+        :keyword coalesce: If True the calls to hook within a `coalesce`:func:
+                 scope are merged and delayed until the end of the scope.
+
+        :keyword priority: Hooks with lower priority are called first.  Hooks
+                 with the same priority are called in the order they were
+                 connected.
+
+        :keyword stop_on: A predicate on the response of the hook.  If it
+                 returns True, the hooks after this one are not called.
+
+        :keyword fields: A list of field names.  If given, the hook is not
+                 called when the signal is sent with 'values' that don't
+                 contain any of the fields.
+
+        :keyword readonly: Set to True to declare the hook doesn't modify its
+                 arguments.  See `is_readonly`:meth:.
+
         :return: receiver
 
         """
+        if deferred not in DEFERRED_MODES:
+            raise ValueError("Invalid value for 'deferred': %r" % (deferred,))
         if not isinstance(sender, (list, tuple)):
             sender = [sender]
+        if isinstance(fields, str):
+            fields = [fields]
+        if fields is not None:
+            fields = frozenset(fields)
         HookClass = Hook if not framework else FrameworkHook
         for s in sender:
             lookup_key = (_make_id(hook), _make_model_id(s))
-            if not any(lookup_key == r_key for r_key, _ in self.hooks):
-                self.hooks.append(
-                    (
-                        lookup_key,
-                        HookClass(hook, sender=s, require_registry=require_registry),
-                    )
+            if _hashable(lookup_key) not in self._registry:
+                self._add(
+                    lookup_key,
+                    HookClass(
+                        hook,
+                        sender=s,
+                        require_registry=require_registry,
+                        deferred=deferred,
+                        coalesce=coalesce,
+                        priority=priority,
+                        stop_on=stop_on,
+                        fields=fields,
+                        readonly=readonly,
+                    ),
                 )
+        self._invalidate()
         return hook
 
     def disconnect(self, hook=None, sender=None):
@@ -77,29 +188,73 @@ class HookDefinition(object):
 
         :param hook: The registered hook to disconnect.
 
-        :param sender: The registered sender to disconnect
+        :param sender: The registered sender(s) to disconnect.
 
         """
-        key = (_make_id(hook), _make_model_id(sender)), hook
-        if key in self.hooks:
-            self.hooks.remove(key)
+        if not isinstance(sender, (list, tuple)):
+            sender = [sender]
+        for s in sender:
+            self._remove((_make_id(hook), _make_model_id(s)))
+        self._invalidate()
 
     def has_listeners(self, sender=None):
         return bool(self.live_hooks(sender))
 
+    def is_readonly(self, sender):
+        """Return True if none of the live hooks modify their arguments.
+
+        That is, if all the live hooks for `sender` were connected with
+        ``readonly=True``.  Senders may use this to avoid copying the
+        arguments.
+
+        """
+        return self._get_dispatch_entry(sender)[2]
+
     def live_hooks(self, sender):
         """Filter sequence of hooks to get resolved (live hooks).
 
         Live hook are defined as those that are installed in the DB and apply
         to the given sender.  Framework-level hooks are always live.
 
+        When the `sender` is a model of a ready registry, the result is taken
+        from a dispatch table indexed by DB and model name.  An entry is only
+        valid for the registry generation (and the hooks) it was computed
+        with: installing or removing addons reloads the registry and
+        `connect`:meth: and `disconnect`:meth: discard the table.
+
         """
+        return self._get_dispatch_entry(sender)[0]
+
+    def _get_dispatch_entry(self, sender):
+        """Return `(live hooks, field index, readonly)` for `sender`.
+
+        The field index is None if none of the live hooks filter by fields.
+        See `_FieldIndex`:class:.  See `is_readonly`:meth: for the last
+        item.
+
+        """
+        where, generation = _get_dispatch_key(sender)
+        if where is not None:
+            entry = self._dispatch.get(where)
+            if entry is not None and entry[0] == generation:
+                return entry[1:]
+        hooks = tuple(self._resolve_hooks(sender))
+        if any(hook.fields is not None for hook in hooks):
+            index = _FieldIndex(hooks)
+        else:
+            index = None
+        readonly = all(hook.readonly for hook in hooks)
+        if where is not None:
+            self._dispatch[where] = (generation, hooks, index, readonly)
+        return hooks, index, readonly
+
+    def _resolve_hooks(self, sender):
         if isinstance(sender, models.Model):
             registry_ready = sender.pool.ready
         else:
             registry_ready = False
         result = []
-        for _, hook in self.hooks:
+        for _, hook in self._candidates(sender):
             if hook.is_installed(sender) and hook.matches(sender):
                 if registry_ready or not hook.require_registry:
                     logger.debug(
@@ -111,12 +266,68 @@ class HookDefinition(object):
                         ),
                     )
                     result.append(hook)
+        # The candidates come in order of connection and the sort is stable.
+        result.sort(key=attrgetter("priority"))
         return result
 
+    def _candidates(self, sender):
+        """Return the pairs `(sequence, hook)` which may match `sender`.
+
+        These are the hooks connected to the model of `sender` and those
+        connected to any sender, in order of connection.
+
+        """
+        wildcard = self._senders.get(None)
+        where = _make_model_id(sender)
+        bucket = self._senders.get(_hashable(where)) if where is not None else None
+        if bucket is None or wildcard is None:
+            return (bucket or wildcard or {}).values()
+        return merge(bucket.values(), wildcard.values())
+
+
+class _FieldIndex(object):
+    """Index from field names to the live hooks interested in them.
+
+    Positions refer to the tuple of live hooks the index was built for.
+
+    """
+
+    __slots__ = ("filtered", "fields")
+
+    def __init__(self, hooks):
+        self.filtered = frozenset(
+            pos for pos, hook in enumerate(hooks) if hook.fields is not None
+        )
+        self.fields = {}
+        for pos in self.filtered:
+            for fname in hooks[pos].fields:
+                self.fields.setdefault(fname, set()).add(pos)
+
+    def select(self, hooks, values):
+        """Return the hooks which should receive a signal with `values`."""
+        keys = _get_values_keys(values)
+        if keys is None:
+            return hooks
+        selected = set()
+        for key in keys:
+            selected.update(self.fields.get(key, ()))
+        filtered = self.filtered
+        return [
+            hook
+            for pos, hook in enumerate(hooks)
+            if pos not in filtered or pos in selected
+        ]
+
 
 class Signal(HookDefinition):
     """Base class for all signals"""
 
+    def _get_receivers(self, sender, kwargs):
+        hooks, index, _ = self._get_dispatch_entry(sender)
+        if index is None or "values" not in kwargs:
+            return hooks
+        return index.select(hooks, kwargs["values"])
+
     def send(self, sender, **kwargs):
         """Send signal from sender to all connected receivers.
 
@@ -135,11 +346,17 @@ class Signal(HookDefinition):
 
         """
         responses = []
-        if not self.hooks:
+        if not self._registry:
             return responses
-        for hook in self.live_hooks(sender):
-            response = hook(sender, self, **kwargs)
+        stats = _instrumentation
+        for hook in self._get_receivers(sender, kwargs):
+            if stats is None:
+                response = hook(sender, self, **kwargs)
+            else:
+                response = stats.call(self, hook, sender, **kwargs)
             responses.append((hook, response))
+            if hook.stop_on is not None and hook.stop_on(response):
+                break
         return responses
 
     def safe_send(self, sender, catched=(Exception,), thrown=None, **kwargs):
@@ -167,11 +384,15 @@ class Signal(HookDefinition):
         responses = []
         if thrown and not isinstance(thrown, (list, tuple)):
             thrown = (thrown,)
-        if not self.hooks:
+        if not self._registry:
             return responses
-        for hook in self.live_hooks(sender):
+        stats = _instrumentation
+        for hook in self._get_receivers(sender, kwargs):
             try:
-                response = hook(sender, self, **kwargs)
+                if stats is None:
+                    response = hook(sender, self, **kwargs)
+                else:
+                    response = stats.call(self, hook, sender, **kwargs)
             except SoftTimeLimitExceeded:
                 raise
             except catched as err:
@@ -184,33 +405,54 @@ class Signal(HookDefinition):
                     responses.append((hook, err))
             else:
                 responses.append((hook, response))
+                if hook.stop_on is not None and hook.stop_on(response):
+                    break
         return responses
 
 
 class Wrapping(HookDefinition):
     def perform(self, method, sender, *args, **kwargs):
         livewrappers = self.live_hooks(sender)
+        if not livewrappers:
+            return method(sender, *args, **kwargs)
+        # When instrumented, the time of a wrapper is the sum of the time
+        # before and after the yield.
+        stats = _instrumentation
         wrappers = []
         for wrapper in livewrappers:
+            start = stats and time.perf_counter()
+            failed = False
             try:
                 w = wrapper(sender, self, *args, **kwargs)
                 try:
                     next(w)
                 except StopIteration:
                     logger.error("Wrapper %s failed to yield once", wrapper)
+                    failed = True
                 else:
-                    wrappers.append(w)
+                    elapsed = stats and time.perf_counter() - start
+                    wrappers.append((wrapper, w, elapsed))
             except Exception:
                 logger.exception("Unexpected error in wrapper")
+                failed = True
+            if stats and failed:
+                stats.record(self, wrapper, sender, time.perf_counter() - start, True)
         result = method(sender, *args, **kwargs)
-        for wrapper in wrappers:
+        for wrapper, w, elapsed in wrappers:
+            start = stats and time.perf_counter()
+            failed = False
             try:
-                wrapper.send(dict(result=result))
-                logger.error("Wrapper %s failed to yield only once")
+                w.send(dict(result=result))
+                logger.error("Wrapper %s failed to yield only once", wrapper)
+                failed = True
             except StopIteration:
                 pass
             except Exception:
                 logger.exception("Unexpected error in wrapper")
+                failed = True
+            if stats:
+                elapsed += time.perf_counter() - start
+                stats.record(self, wrapper, sender, elapsed, failed)
         return result
 
 
@@ -223,13 +465,35 @@ class Hook(object):
         hash(func)  # Fail if func is not hashable
         self.func = func
         smart_copy(
-            kwargs, self.__dict__, defaults={"require_registry": True, "sender": None}
+            kwargs,
+            self.__dict__,
+            defaults={
+                "require_registry": True,
+                "sender": None,
+                "deferred": None,
+                "coalesce": False,
+                "priority": 0,
+                "stop_on": None,
+                "fields": None,
+                "readonly": False,
+            },
         )
+        self.sender_id = _make_model_id(self.sender)
 
     def __repr__(self):
         return "<Hook for %r>" % self.func
 
     def __call__(self, *args, **kwargs):
+        if self.coalesce and _scopes.stack:
+            scope = _scopes.find(args[1])
+            if scope is not None:
+                return scope.add(self, *args, **kwargs)
+        return self.deliver(*args, **kwargs)
+
+    def deliver(self, *args, **kwargs):
+        """Call the hook now, unless it's deferred."""
+        if self.deferred:
+            return _deferred.push(self, *args, **kwargs)
         return self.func(*args, **kwargs)
 
     # So that the original receiver compares equal to this wrapper.  This
@@ -241,8 +505,7 @@ class Hook(object):
         return self.func == other
 
     def matches(self, sender):
-        key = _make_model_id(sender)
-        return not self.sender or key == _make_model_id(self.sender)
+        return not self.sender or _make_model_id(sender) == self.sender_id
 
     def is_installed(self, sender):
         """Check whether this receiver is installed in the DB of `sender`.
@@ -268,6 +531,576 @@ class FrameworkHook(Hook):
         return True
 
 
+# Possible values of the argument 'deferred' of receivers.
+DEFERRED_MODES = (None, "commit")
+
+
+class _Records(object):
+    """A recordset detached from its environment."""
+
+    __slots__ = ("model", "ids")
+
+    def __init__(self, records):
+        self.model = records._name
+        self.ids = tuple(records.ids)
+
+    def attach(self, env):
+        return env[self.model].browse(self.ids)
+
+
+def _detach(value):
+    # Recordsets are detached at any depth within dicts, lists and tuples.
+    if isinstance(value, models.BaseModel):
+        return _Records(value)
+    elif isinstance(value, dict):
+        return {key: _detach(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_detach(item) for item in value]
+    elif isinstance(value, tuple):
+        return _make_tuple(value, [_detach(item) for item in value])
+    else:
+        return value
+
+
+def _attach(value, env):
+    if isinstance(value, _Records):
+        return value.attach(env)
+    elif isinstance(value, dict):
+        return {key: _attach(item, env) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_attach(item, env) for item in value]
+    elif isinstance(value, tuple):
+        return _make_tuple(value, [_attach(item, env) for item in value])
+    else:
+        return value
+
+
+def _make_tuple(original, items):
+    if hasattr(original, "_fields"):
+        return type(original)(*items)  # named tuples
+    return tuple(items)
+
+
+class DeferredEvent(object):
+    """A call to a deferred receiver waiting for the commit of its cursor.
+
+    The sender and any recordset in the arguments are kept as model names and
+    ids.  The receiver is called with a new cursor in the same DB, with the
+    same user and context.
+
+    """
+
+    __slots__ = ("hook", "signal", "dbname", "uid", "context", "sender", "kwargs")
+
+    def __init__(self, hook, sender, signal, kwargs):
+        env = sender.env
+        self.hook = hook
+        self.signal = signal
+        self.dbname = env.cr.dbname
+        self.uid = env.uid
+        self.context = dict(env.context)
+        self.sender = _Records(sender)
+        self.kwargs = {key: _detach(value) for key, value in kwargs.items()}
+
+    def __repr__(self):
+        return "<DeferredEvent %s for %s%r>" % (
+            self.signal,
+            self.sender.model,
+            self.sender.ids,
+        )
+
+    def deliver(self):
+        from odoo import registry
+
+        with api.Environment.manage():
+            with registry(self.dbname).cursor() as cr:
+                env = api.Environment(cr, self.uid, self.context)
+                sender = self.sender.attach(env)
+                kwargs = {
+                    key: _attach(value, env) for key, value in self.kwargs.items()
+                }
+                return self.hook.func(sender, self.signal, **kwargs)
+
+
+class _DeferredDelivery(object):
+    """Keeps deferred events until their cursor commits.
+
+    Events of a cursor are discarded if it rolls back, and so are the events
+    pushed within a savepoint which rolls back.  Upon commit they are
+    submitted to the executor.
+
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.executor = None
+        self._pending = WeakKeyDictionary()
+        self._lock = Lock()
+        self.waiting = self.queued = self.delivered = self.failed = 0
+        self.lag = self.max_lag = self.total_lag = 0.0
+
+    def push(self, hook, sender, signal, **kwargs):
+        cr = getattr(getattr(sender, "env", None), "cr", None)
+        if cr is None:
+            # There's no transaction to wait for.
+            return hook.func(sender, signal, **kwargs)
+        event = DeferredEvent(hook, sender, signal, kwargs)
+        with self._lock:
+            events = self._pending.get(cr)
+            if events is None:
+                events = self._pending[cr] = []
+                cr.after("commit", lambda: self.commit(cr))
+                cr.after("rollback", lambda: self.rollback(cr))
+            events.append(event)
+            self.waiting += 1
+        return event
+
+    def commit(self, cr):
+        with self._lock:
+            events = self._pending.pop(cr, ())
+            self.waiting -= len(events)
+            self.queued += len(events)
+        if events:
+            executor = self.get_executor()
+            committed_at = time.time()
+            for event in events:
+                executor.submit(self.deliver, event, committed_at)
+
+    def rollback(self, cr):
+        with self._lock:
+            events = self._pending.pop(cr, ())
+            self.waiting -= len(events)
+        if events:
+            logger.debug("Discarding %d deferred events after rollback", len(events))
+
+    def mark(self, cr):
+        """Return the number of events of `cr`, see `rollback_to`:meth:."""
+        with self._lock:
+            return len(self._pending.get(cr, ()))
+
+    def rollback_to(self, cr, mark):
+        """Discard the events of `cr` pushed after `mark`."""
+        with self._lock:
+            events = self._pending.get(cr, [])
+            discarded = len(events) - mark
+            del events[mark:]
+            self.waiting -= max(discarded, 0)
+        if discarded > 0:
+            logger.debug(
+                "Discarding %d deferred events after rollback to savepoint",
+                discarded,
+            )
+
+    def deliver(self, event, committed_at):
+        lag = time.time() - committed_at
+        with self._lock:
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+        try:
+            event.deliver()
+        except Exception:
+            logger.exception("Unexpected error in deferred receiver %s", event.hook)
+            failed = 1
+        else:
+            failed = 0
+        with self._lock:
+            self.queued -= 1
+            self.delivered += 1 - failed
+            self.failed += failed
+
+    def get_executor(self):
+        if self.executor is None:
+            with self._lock:
+                if self.executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self.executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="xoeuf.signals",
+                    )
+        return self.executor
+
+    def get_stats(self):
+        with self._lock:
+            done = self.delivered + self.failed
+            return dict(
+                waiting=self.waiting,
+                queued=self.queued,
+                delivered=self.delivered,
+                failed=self.failed,
+                lag=self.lag,
+                max_lag=self.max_lag,
+                mean_lag=self.total_lag / done if done else 0.0,
+            )
+
+
+_deferred = _DeferredDelivery()
+
+
+def set_deferred_executor(executor=None, max_workers=None):
+    """Set the executor of the `deferred receivers <receiver>`:func:.
+
+    Deferred receivers are not called when the signal is sent.  Instead, the
+    call is queued until the cursor of the sender commits (it's discarded if
+    the cursor, or the ``cr.savepoint()`` it was queued within, rolls back).
+    Then, it's submitted to the executor.  Each
+    receiver runs with a new cursor in the DB of the sender, with the same
+    user and context.  Errors are logged and ignored.
+
+    :param executor: Any object with a `submit` method like those in
+           `concurrent.futures`:mod:.  If None, use a thread pool which is
+           created the first time it's needed.
+
+    :param max_workers: The maximum number of threads of the default thread
+           pool.  It's ignored if the pool was already created.
+
+    .. versionadded:: 2.6.0
+
+    """
+    if max_workers is not None:
+        _deferred.max_workers = max_workers
+    _deferred.executor = executor
+
+
+def get_deferred_stats():
+    """Return the metrics of the delivery of `deferred receivers <receiver>`:func:.
+
+    The result is a dictionary with the following keys:
+
+    - 'waiting': number of calls waiting for their cursor to commit.
+    - 'queued': number of calls submitted to the executor and not yet done.
+    - 'delivered' and 'failed': number of calls done without and with errors.
+    - 'lag', 'max_lag' and 'mean_lag': seconds elapsed between the commit and
+      the call; for the last one, the maximum and the mean.
+
+    .. versionadded:: 2.6.0
+
+    """
+    return _deferred.get_stats()
+
+
+def _merge_argument(old, new):
+    if isinstance(old, models.BaseModel) and isinstance(new, models.BaseModel):
+        return old | new
+    elif isinstance(old, dict) and isinstance(new, dict):
+        return dict(old, **new)
+    elif isinstance(old, list) and isinstance(new, list):
+        return old + new
+    else:
+        return new
+
+
+def _get_values_keys(values):
+    if isinstance(values, dict):
+        return frozenset(values)
+    elif isinstance(values, (list, tuple)):
+        # create() receives a list of dicts.
+        return frozenset(key for vals in values for key in vals)
+    else:
+        return None
+
+
+class CoalescingScope(object):
+    """Collects the calls to coalescing receivers within `coalesce`:func:.
+
+    Calls to the same receiver with senders of the same model (and same
+    cursor and user) and the same keys in 'values' are merged into a single
+    call with the union of the senders.  Recordsets in the other arguments
+    are also joined, dictionaries are updated (the last value wins), lists
+    are concatenated, and any other argument takes its last value.
+
+    """
+
+    def __init__(self, signals):
+        self.signals = signals
+        self.calls = OrderedDict()
+
+    def add(self, hook, sender, signal, **kwargs):
+        env = getattr(sender, "env", None)
+        key = (
+            hook,
+            signal,
+            _make_model_id(sender),
+            id(env.cr) if env is not None else None,
+            env.uid if env is not None else None,
+            _get_values_keys(kwargs.get("values")),
+        )
+        call = self.calls.get(key)
+        if call is None:
+            self.calls[key] = [sender, kwargs]
+        else:
+            call[0] = _merge_argument(call[0], sender)
+            previous = call[1]
+            call[1] = {
+                name: _merge_argument(previous[name], value)
+                if name in previous
+                else value
+                for name, value in kwargs.items()
+            }
+
+    def flush(self):
+        """Call the receivers with the calls merged so far.
+
+        Errors are logged and ignored, as in `Signal.safe_send`:meth:.
+
+        """
+        from celery.exceptions import SoftTimeLimitExceeded
+
+        calls, self.calls = self.calls, OrderedDict()
+        for (hook, signal, *_), (sender, kwargs) in calls.items():
+            try:
+                hook.deliver(sender, signal, **kwargs)
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception as error:
+                logger.exception(error)
+
+    def discard(self):
+        self.calls.clear()
+
+
+class _CoalescingScopes(local):
+    def __init__(self):
+        self.stack = []
+
+    def find(self, signal):
+        for scope in reversed(self.stack):
+            if signal in scope.signals:
+                return scope
+        return None
+
+
+_scopes = _CoalescingScopes()
+
+
+@contextmanager
+def coalesce(*signals):
+    """Context manager which merges the calls to coalescing receivers.
+
+    Within the scope, receivers of any of `signals` connected with
+    ``coalesce=True`` are not called when the signal is sent.  Their calls
+    are merged (see `CoalescingScope`:class:) and made when the scope exits
+    or when the `~CoalescingScope.flush`:meth: method of the scope is
+    called::
+
+        @receiver(post_write, sender='account.move', coalesce=True)
+        def reconcile(sender, signal, values=None, **kwargs):
+            ...
+
+        with coalesce(post_write) as scope:
+            for move in moves:
+                move.write({'ref': compute_ref(move)})
+
+    Receivers without ``coalesce=True`` are called as usual.  If the scope
+    exits with an error the pending calls are discarded.
+
+    .. versionadded:: 2.6.0
+
+    """
+    scope = CoalescingScope(signals)
+    _scopes.stack.append(scope)
+    try:
+        yield scope
+    except BaseException:
+        scope.discard()
+        raise
+    finally:
+        _scopes.stack.remove(scope)
+    scope.flush()
+
+
+class _ReceiverStats(object):
+    __slots__ = ("calls", "errors", "total", "samples")
+
+    def __init__(self, samples):
+        self.calls = self.errors = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=samples)
+
+
+class SignalStats(object):
+    """Timing of the receivers (and wrappers) of signals.
+
+    Stats are kept per signal, receiver and model (the name of the model of
+    the sender).  For each one we count the calls and the errors, the total
+    time, and keep the last `samples` times to compute percentiles.
+
+    .. seealso:: `enable_instrumentation`:func:.
+
+    """
+
+    quantiles = (0.5, 0.9, 0.99)
+
+    def __init__(self, samples=1000):
+        self.samples = samples
+        self._lock = Lock()
+        self._stats = {}
+
+    def call(self, signal, hook, sender, *args, **kwargs):
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = hook(sender, signal, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            self.record(signal, hook, sender, time.perf_counter() - start, failed)
+
+    def record(self, signal, hook, sender, elapsed, failed=False):
+        key = (signal, hook, _make_model_id(sender))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _ReceiverStats(self.samples)
+            stats.calls += 1
+            stats.errors += failed
+            stats.total += elapsed
+            stats.samples.append(elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self):
+        """Return a list of dicts with the current stats.
+
+        Each item has the keys 'signal', 'receiver' and 'model'; 'calls',
+        'errors', 'total' (in seconds) and 'percentiles' (a dict from
+        quantile to seconds).  Items are sorted by total time descending.
+
+        """
+        from xotl.tools.names import nameof
+
+        with self._lock:
+            items = [
+                (key, stats.calls, stats.errors, stats.total, sorted(stats.samples))
+                for key, stats in self._stats.items()
+            ]
+        result = []
+        for (signal, hook, model), calls, errors, total, samples in items:
+            result.append(
+                dict(
+                    signal=signal.action,
+                    receiver=nameof(hook.func, inner=True, full=True),
+                    model=model if model is None else str(model),
+                    calls=calls,
+                    errors=errors,
+                    total=total,
+                    percentiles={
+                        q: samples[min(int(q * len(samples)), len(samples) - 1)]
+                        for q in self.quantiles
+                    }
+                    if samples
+                    else {},
+                )
+            )
+        result.sort(key=lambda item: item["total"], reverse=True)
+        return result
+
+    def as_json(self, **kwargs):
+        """Return the `snapshot`:meth: as JSON.
+
+        Keyword arguments are passed to `json.dumps`:func:.
+
+        """
+        import json
+
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def as_prometheus(self, prefix="xoeuf_signal_receiver"):
+        """Return the `snapshot`:meth: in the Prometheus text format.
+
+        Times are exposed as a summary ``<prefix>_seconds`` and errors as
+        the counter ``<prefix>_errors_total``.
+
+        """
+
+        def _labels(item, **extra):
+            labels = dict(
+                signal=item["signal"], receiver=item["receiver"], model=item["model"]
+            )
+            labels.update(extra)
+            return ",".join(
+                '%s="%s"' % (name, _escape(value)) for name, value in labels.items()
+            )
+
+        def _escape(value):
+            value = "" if value is None else str(value)
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP %s_seconds Time spent in the receivers of signals." % prefix,
+            "# TYPE %s_seconds summary" % prefix,
+        ]
+        for item in snapshot:
+            for q, value in sorted(item["percentiles"].items()):
+                lines.append(
+                    "%s_seconds{%s} %r" % (prefix, _labels(item, quantile=q), value)
+                )
+            lines.append(
+                "%s_seconds_sum{%s} %r" % (prefix, _labels(item), item["total"])
+            )
+            lines.append(
+                "%s_seconds_count{%s} %d" % (prefix, _labels(item), item["calls"])
+            )
+        lines.extend(
+            [
+                "# HELP %s_errors_total Errors in the receivers of signals." % prefix,
+                "# TYPE %s_errors_total counter" % prefix,
+            ]
+        )
+        for item in snapshot:
+            lines.append(
+                "%s_errors_total{%s} %d" % (prefix, _labels(item), item["errors"])
+            )
+        return "\n".join(lines) + "\n"
+
+
+_instrumentation = None
+
+
+def enable_instrumentation(samples=1000):
+    """Start timing the receivers and wrappers of all signals.
+
+    Return the `SignalStats`:class: collecting the stats.  If the
+    instrumentation was already enabled, return the current one.
+
+    When it's not enabled, the cost for signals is a single check per
+    receiver.
+
+    .. versionadded:: 2.6.0
+
+    """
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = SignalStats(samples)
+    return _instrumentation
+
+
+def disable_instrumentation():
+    """Stop timing the receivers of signals.
+
+    Return the `SignalStats`:class: with the stats collected so far, or None.
+
+    .. versionadded:: 2.6.0
+
+    """
+    global _instrumentation
+    result, _instrumentation = _instrumentation, None
+    return result
+
+
+def get_instrumentation():
+    """Return the current `SignalStats`:class: or None if not enabled.
+
+    .. versionadded:: 2.6.0
+
+    """
+    return _instrumentation
+
+
 def receiver(signal, **kwargs):
     """A decorator for connecting receivers to signals.
 
@@ -279,6 +1112,27 @@ def receiver(signal, **kwargs):
     :keyword framework: Set to True to make this a `framework-level receiver
                         <FrameworkHook>`:class:.
 
+    :keyword deferred: Set to 'commit' to call the receiver after the cursor
+             of the sender commits, instead of when the signal is sent.  See
+             `set_deferred_executor`:func:.
+
+    :keyword coalesce: Set to True to merge the calls within a
+             `coalesce`:func: scope.
+
+    :keyword priority: Receivers with lower priority are called first.  The
+             default is 0.
+
+    :keyword stop_on: A predicate on the response of the receiver.  If it
+             returns True, `Signal.send`:meth: doesn't call the remaining
+             receivers.
+
+    :keyword fields: A list of field names.  The receiver is not called if the
+             signal is sent with 'values' (e.g `pre_write`:obj: and
+             `post_create`:obj:) that don't contain any of the fields.
+
+    :keyword readonly: Set to True to declare that the receiver doesn't modify
+             its arguments (e.g the `query` of `pre_search`:obj:).
+
     Used by passing in the signal (or list of signals) and keyword arguments
     to connect::
 
@@ -293,6 +1147,9 @@ def receiver(signal, **kwargs):
     .. versionchanged:: 0.56.0 `signal` is not required to be a list or tuple,
                         but any type of iterable (`iter`:func:).
 
+    .. versionchanged:: 2.6.0 Add the `deferred`, `coalesce`, `priority`,
+       `stop_on`, `fields` and `readonly` keyword arguments.
+
     """
 
     def _decorator(func):
@@ -429,17 +1286,76 @@ def is_installed(self, func):
     env = getattr(self, "env", None)
     if not module or not env:
         return True
-    dbname = env.cr.dbname
-    with _lock:
-        result = _cache.get((dbname, module), Unset)
-        if result is not Unset:
-            return result
-    Module = env["ir.module.module"].sudo()
-    query = [("state", "=", "installed"), ("name", "=", module)]
-    with _no_signalling(pre_search), _no_signalling(post_search):
-        result = bool(Module.search(query, limit=1))
-    with _lock:
-        _cache[module] = result
+    return module in get_installed_addons(env)
+
+
+def get_installed_addons(env):
+    """Return the names of the addons installed in the DB of `env`.
+
+    The result is a frozenset loaded with a single query.  It's kept until
+    the registry is reloaded (i.e its signaling sequence changes), which
+    happens after installing or removing addons.  While the registry is not
+    ready addons are still being installed, so we don't keep the result.
+
+    """
+    registry = env.registry
+    generation = (id(registry), registry.registry_sequence)
+    entry = _installed_addons.get(env.cr.dbname)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    env.cr.execute("SELECT name FROM ir_module_module WHERE state = 'installed'")
+    result = frozenset(name for name, in env.cr.fetchall())
+    if registry.ready:
+        _installed_addons[env.cr.dbname] = (generation, result)
+    return result
+
+
+def _get_dispatch_key(sender):
+    """Return the key of `sender` in the dispatch tables of hooks.
+
+    The result is a pair of `(where, generation)`.  `where` is None if the
+    hooks for `sender` must not be cached: either it's not a model or its
+    registry is not ready (the set of installed addons may change while
+    loading the registry).
+
+    """
+    if not isinstance(sender, models.BaseModel):
+        return None, None
+    registry = sender.pool
+    if not registry.ready:
+        return None, None
+    generation = (id(registry), registry.registry_sequence, HookDefinition._version)
+    return (sender.env.cr.dbname, sender._name), generation
+
+
+# Maps `(dbname, model name)` to a pair of `(generation, bitmap)`.  See
+# `_get_listeners`:func:.
+_listeners = {}
+
+
+def _get_listeners(sender, mask):
+    """Return the bitmap of the hook definitions in `mask` listening `sender`.
+
+    The bit of a definition (its `bit` attribute) is set if it has any live
+    hook for `sender`.  The patched ORM methods use this to bypass the whole
+    dispatch when nobody is listening.
+
+    """
+    where, generation = _get_dispatch_key(sender)
+    if where is None:
+        return _find_listeners(sender, mask)
+    entry = _listeners.get(where)
+    if entry is None or entry[0] != generation:
+        entry = (generation, _find_listeners(sender))
+        _listeners[where] = entry
+    return entry[1] & mask
+
+
+def _find_listeners(sender, mask=-1):
+    result = 0
+    for definition in HookDefinition.definitions:
+        if definition.bit & mask and definition.live_hooks(sender):
+            result |= definition.bit
     return result
 
 
@@ -449,6 +1365,38 @@ def _make_id(target):
     return id(target)
 
 
+class _Unhashable(object):
+    """Wraps an unhashable sender (or lookup key) to use it as a dict key.
+
+    All of them have the same hash, so a lookup compares the wrapped values
+    by equality like a scan of a list.
+
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return 0
+
+    def __eq__(self, other):
+        return isinstance(other, _Unhashable) and self.value == other.value
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return _Unhashable(value)
+    return value
+
+
+def _unwrap(value):
+    return value.value if isinstance(value, _Unhashable) else value
+
+
 def _issubcls(which, Class):
     return isinstance(which, type) and issubclass(which, Class)
 
@@ -483,9 +1431,12 @@ Arguments:
 :param sender: The recordset where the 'search' was called.
 
 :keyword query: The domain (argument `args` in Odoo's search method).
-                This will be `list`:class: that can be modified in place, to
-                customize the search.  But notice that the order in which the
-                receivers are called is not defined.
+                This is a list that can be modified in place, to customize
+                the search; it's a copy of the domain given to 'search'.
+                Receivers are called in order of priority (see
+                `receiver`:func:).  If all the receivers of this signal and
+                `post_search`:obj: are connected with ``readonly=True``, the
+                domain is not copied: this is the domain given to 'search'.
 
 :keyword kw_args: The rest of the arguments to 'search'.  We make it a dict as
                   if called by keyword.
@@ -648,6 +1599,8 @@ def _fvg_for_signals(
     kwargs = dict(
         view_id=view_id, view_type=view_type, toolbar=toolbar, submenu=submenu
     )
+    if not _get_listeners(self, _FVG_SIGNALS):
+        return super_fields_view_get(self, **kwargs)
     pre_fields_view_get.send(sender=self, **kwargs)
     result = super_fields_view_get(self, **kwargs)
     post_fields_view_get.safe_send(sender=self, result=result, **kwargs)
@@ -658,10 +1611,16 @@ def _fvg_for_signals(
 @api.returns("self", lambda value: value.id if value else value)
 @wraps(super_create)
 def _create_for_signals(self, vals):
-    pre_create.send(sender=self, values=vals)
-    res = super_create(self, vals)
-    post_create.safe_send(sender=self, result=res, values=vals)
-    return res
+    try:
+        if not _get_listeners(self, _CREATE_SIGNALS):
+            return super_create(self, vals)
+        pre_create.send(sender=self, values=vals)
+        res = super_create(self, vals)
+        post_create.safe_send(sender=self, result=res, values=vals)
+        return res
+    finally:
+        if _search_caches:
+            _invalidate_search_cache(self)
 
 
 @api.multi
@@ -675,10 +1634,16 @@ def _write_for_signals(self, vals):
 
 @api.multi
 def _unlink_for_signals(self):
-    pre_unlink.send(self)
-    res = super_unlink(self)
-    post_unlink.safe_send(self, result=res)
-    return res
+    try:
+        if not _get_listeners(self, _UNLINK_SIGNALS):
+            return super_unlink(self)
+        pre_unlink.send(self)
+        res = super_unlink(self)
+        post_unlink.safe_send(self, result=res)
+        return res
+    finally:
+        if _search_caches:
+            _invalidate_search_cache(self)
 
 
 write_wrapper = Wrapping(
@@ -693,21 +1658,340 @@ Wraps the `write` method.
 @api.multi
 @wraps(_write_for_signals)
 def _write_for_wrappers(self, vals):
-    return write_wrapper.perform(_write_for_signals, self, vals)
+    try:
+        listeners = _get_listeners(self, _WRITE_SIGNALS)
+        if not listeners:
+            return super_write(self, vals)
+        elif not listeners & write_wrapper.bit:
+            return _write_for_signals(self, vals)
+        return write_wrapper.perform(_write_for_signals, self, vals)
+    finally:
+        if _search_caches:
+            _invalidate_search_cache(self)
 
 
 @api.model
 @api.returns(*super_search._returns)
 @wraps(super_search)
 def _search_for_signals(self, args, offset=0, limit=None, order=None, count=False):
-    query = list(args)
+    search = _cached_search if _search_caches else super_search
+    if not _get_listeners(self, _SEARCH_SIGNALS):
+        return search(self, args, offset=offset, limit=limit, order=order, count=count)
     kw_args = dict(offset=offset, limit=limit, order=order, count=count)
+    # Receivers get a copy of the domain, unless all of them are read-only.
+    if pre_search.is_readonly(self) and post_search.is_readonly(self):
+        query = args
+    else:
+        query = list(args)
     pre_search.send(self, query=query, kw_args=kw_args)
-    result = super_search(self, query, **kw_args)
+    result = search(self, query, **kw_args)
     post_search.safe_send(self, query=query, kw_args=kw_args, result=result)
     return result
 
 
+def _cached_search(self, domain, offset=0, limit=None, order=None, count=False):
+    cache = _search_caches.get(self.env.cr)
+    if cache is None or offset or limit or count:
+        return super_search(
+            self, domain, offset=offset, limit=limit, order=order, count=count
+        )
+    return cache.search(self, domain, order)
+
+
+# Maps cursors to their `SearchCache`:class:.
+_search_caches = WeakKeyDictionary()
+_search_caches_lock = Lock()
+
+
+class SearchCache(object):
+    """The results of the searches within a transaction.
+
+    Only searches without `offset`, `limit` and `count` are cached.  Results
+    are kept per model, user, context and `order`.
+
+    A search with the same domain as a cached one returns the same records.
+    A search with a domain which `implies <xoeuf.osv.expression.Domain.implies>`:meth:
+    a cached one is answered by filtering the cached records with
+    `~xoeuf.osv.expression.Domain.asbatchfilter`:meth:, if the domain only
+    has terms which are evaluated in Python as in SQL: '=', '!=', 'in' and
+    'not in' over stored fields (not relational nor translatable) of types
+    integer, float, monetary, char, selection and boolean, with values other
+    than False, 0 and None.  The results of domains with the 'active' field
+    are not used to answer the domains without it (Odoo doesn't filter the
+    archived records for them), nor the other way around.
+
+    The results of a domain are discarded after a ``create``, ``write`` or
+    ``unlink`` on any of the models it depends on: the searched model, the
+    models it inherits with ``_inherits``, and the models traversed by its
+    relational fields (e.g ``res.partner`` for ``('partner_id.name', '=',
+    'Jane')``).  Domains with non-stored fields which are not related fields
+    (i.e with a search method) are not cached.
+
+    .. warning:: Changes which don't go through those methods (e.g SQL
+       queries or the recomputation of stored fields) are not seen.  Record
+       rules which depend on other models may also be outdated.
+
+    .. versionadded:: 2.6.0
+
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.results = {}
+
+    def search(self, model, domain, order):
+        key = _get_search_key(model, order)
+        try:
+            frozen = Domain(domain).freeze()
+            hash(frozen)
+            depends = _get_search_dependencies(model, frozen)
+        except Exception:
+            # Leave the errors of malformed domains to the search.
+            key = depends = None
+        if key is None or depends is None:
+            return super_search(model, domain, order=order)
+        domain = frozen
+        # Odoo doesn't filter archived records if the domain has the 'active'
+        # field: those results can't answer the domains without it, nor the
+        # other way around.
+        key += (_mentions_active(model, domain),)
+        results = self.results.get(key)
+        if results is None:
+            results = self.results[key] = OrderedDict()
+        ids = None
+        entry = results.get(domain)
+        if entry is not None:
+            results.move_to_end(domain)
+            ids = entry[0]
+            _search_stats.record("hits")
+        elif results and _is_filterable(model, domain):
+            tree = DomainTree(domain.second_normal_form, single_valued=True)
+            for cached_ids, cached_tree, _ in reversed(list(results.values())):
+                if tree.implies(cached_tree):
+                    records = model.browse(cached_ids)
+                    ids = domain.asbatchfilter(records).ids
+                    _search_stats.record("implied")
+                    break
+        if ids is None:
+            ids = super_search(model, domain, order=order).ids
+            _search_stats.record("misses")
+        if entry is None:
+            results[domain] = (ids, DomainTree(domain.second_normal_form), depends)
+            while len(results) > self.maxsize:
+                results.popitem(last=False)
+        return model.browse(ids)
+
+    def invalidate(self, model):
+        """Discard the results of the domains which depend on `model`."""
+        name = model._name
+        for key, results in list(self.results.items()):
+            for domain, (_, _, depends) in list(results.items()):
+                if name in depends:
+                    del results[domain]
+                    _search_stats.record("invalidations")
+            if not results:
+                del self.results[key]
+
+    def clear(self):
+        self.results.clear()
+
+
+class _SearchStats(object):
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def record(self, what):
+        with self._lock:
+            setattr(self, what, getattr(self, what) + 1)
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.implied = self.misses = self.invalidations = 0
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.implied + self.misses
+            return dict(
+                hits=self.hits,
+                implied=self.implied,
+                misses=self.misses,
+                invalidations=self.invalidations,
+                hit_rate=(self.hits + self.implied) / total if total else 0.0,
+            )
+
+
+_search_stats = _SearchStats()
+
+
+def enable_search_cache(env, maxsize=32):
+    """Cache the results of searches in the transaction of `env`.
+
+    The cache is used by all the environments with the same cursor, and it's
+    discarded when the cursor commits or rolls back.  See
+    `SearchCache`:class:.
+
+    :param maxsize: The maximum number of domains kept per model, user,
+           context and order.  It's ignored if the cache was already enabled.
+
+    :return: The `SearchCache`:class:.
+
+    .. versionadded:: 2.6.0
+
+    """
+    cr = env.cr
+    with _search_caches_lock:
+        cache = _search_caches.get(cr)
+        if cache is None:
+            cache = _search_caches[cr] = SearchCache(maxsize)
+            cr.after("commit", lambda: disable_search_cache(env))
+            cr.after("rollback", lambda: disable_search_cache(env))
+    return cache
+
+
+def disable_search_cache(env):
+    """Discard the search cache of the transaction of `env`.
+
+    .. versionadded:: 2.6.0
+
+    """
+    with _search_caches_lock:
+        _search_caches.pop(env.cr, None)
+
+
+def get_search_cache_stats():
+    """Return the statistics of the search caches.
+
+    The result is a dictionary with the keys 'hits' (searches with a cached
+    domain), 'implied' (searches answered by filtering the results of another
+    domain), 'misses', 'invalidations' (results discarded by changes) and
+    'hit_rate'.
+
+    .. versionadded:: 2.6.0
+
+    """
+    return _search_stats.get_stats()
+
+
+def _invalidate_search_cache(model):
+    cache = _search_caches.get(model.env.cr)
+    if cache is not None:
+        cache.invalidate(model)
+
+
+def _mentions_active(model, domain):
+    active = getattr(model, "_active_name", "active")
+    return any(term[0] == active for term in domain if not isinstance(term, str))
+
+
+def _get_search_key(model, order):
+    env = model.env
+    try:
+        context = frozenset(env.context.items())
+        hash(context)
+    except TypeError:
+        return None
+    return (model._name, env.uid, order, context)
+
+
+def _get_search_dependencies(model, domain):
+    """Return the names of the models the result of `domain` depends on.
+
+    Return None if it can't be known: the domain has a field which is neither
+    stored nor related.
+
+    """
+    result = set()
+    _add_inherited_models(result, model)
+    for kind, term in domain.walk():
+        if kind != "TERM":
+            continue
+        fname = term[0]
+        if not isinstance(fname, str):
+            # The TRUE and FALSE leaves.
+            continue
+        if not _add_path_models(result, model, fname.split(".")):
+            return None
+    return frozenset(result)
+
+
+def _add_path_models(result, model, path):
+    for fname in path:
+        field = model._fields.get(fname)
+        if field is None:
+            return False
+        elif not field.store:
+            if not field.related:
+                return False
+            related = field.related
+            if isinstance(related, str):
+                related = related.split(".")
+            if not _add_path_models(result, model, related):
+                return False
+        if field.relational:
+            model = model.env[field.comodel_name]
+            _add_inherited_models(result, model)
+    return True
+
+
+def _add_inherited_models(result, model):
+    result.add(model._name)
+    for name in model._inherits:
+        _add_inherited_models(result, model.env[name])
+
+
+# The field types and operators for which the search in Python gives the same
+# result as SQL (values False, 0 and None excluded).
+_FILTERABLE_TYPES = {"integer", "float", "monetary", "char", "selection", "boolean"}
+_FILTERABLE_OPERATORS = {"=", "!=", "in", "not in"}
+
+
+def _is_filterable(model, domain):
+    for kind, term in domain.walk():
+        if kind != "TERM":
+            continue
+        fname, operator, value = term
+        if not isinstance(fname, str):
+            return False
+        field = model._fields.get(fname)
+        if (
+            field is None
+            or not field.store
+            or field.type not in _FILTERABLE_TYPES
+            or getattr(field, "translate", False)
+            or operator not in _FILTERABLE_OPERATORS
+        ):
+            return False
+        values = value if operator in ("in", "not in") else (value,)
+        # Odoo reads NULL integers as 0, and NULL chars as False.
+        if any(x is None or x == False for x in values):  # noqa
+            return False
+    return True
+
+
+_FVG_SIGNALS = pre_fields_view_get.bit | post_fields_view_get.bit
+_CREATE_SIGNALS = pre_create.bit | post_create.bit
+_WRITE_SIGNALS = pre_write.bit | post_write.bit | write_wrapper.bit
+_UNLINK_SIGNALS = pre_unlink.bit | post_unlink.bit
+_SEARCH_SIGNALS = pre_search.bit | post_search.bit
+
+super_savepoint = sql_db.Cursor.savepoint
+
+
+@contextmanager
+@wraps(super_savepoint)
+def _savepoint_for_deferred(self):
+    mark = _deferred.mark(self)
+    try:
+        with super_savepoint(self):
+            yield
+    except Exception:
+        _deferred.rollback_to(self, mark)
+        raise
+
+
+sql_db.Cursor.savepoint = _savepoint_for_deferred
+
 models.BaseModel.fields_view_get = _fvg_for_signals
 models.BaseModel.create = _create_for_signals
 models.BaseModel.unlink = _unlink_for_signals
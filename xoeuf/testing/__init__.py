@@ -7,3 +7,4 @@
 # This is free software; you can do what the LICENCE file allows you to.
 #
 from .db import *  # noqa
+from .benchmarks import *  # noqa
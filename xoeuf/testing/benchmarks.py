@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Helpers to write micro-benchmarks as test cases.
+
+Benchmarks are skipped unless the environment variable ``XOEUF_BENCHMARKS``
+is set.
+
+.. versionadded:: 2.6.0
+
+"""
+import os
+import time
+import unittest
+
+__all__ = ["BENCHMARKS", "TOLERANCE", "benchmark", "best_of", "timeit"]
+
+
+#: True if the benchmarks should run.
+BENCHMARKS = bool(os.environ.get("XOEUF_BENCHMARKS"))
+
+#: The tolerated ratio of an optimized path over the one it replaces (or
+#: over vanilla Odoo).  This is within the noise of the measurements.
+TOLERANCE = 1.1
+
+#: Decorate a test case (or method) to skip it unless `BENCHMARKS`.
+benchmark = unittest.skipUnless(
+    BENCHMARKS, "Set XOEUF_BENCHMARKS to run the benchmarks"
+)
+
+
+def best_of(func, number=1000, repeat=5):
+    """Return the best time (in seconds) to call `func` `number` times."""
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if result is None or elapsed < result:
+            result = elapsed
+    return result
+
+
+def timeit(func):
+    """Return the time (in seconds) to call `func` once."""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
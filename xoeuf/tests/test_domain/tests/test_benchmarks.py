@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Micro-benchmarks for domains.
+
+These are skipped unless the environment variable XOEUF_BENCHMARKS is set.
+
+"""
+import logging
+
+from xoeuf.osv.expression import Domain
+from xoeuf.testing.benchmarks import benchmark, timeit
+
+from odoo.tests.common import BaseCase
+
+logger = logging.getLogger(__name__)
+
+
+def make_or_domain(count):
+    """Return a domain like the ones `execute_onupdate` builds."""
+    return Domain.OR(
+        *(
+            [("path_%d" % (i % 1000), "in", (i, i + 1))] if i % 2 else [("age", ">", i)]
+            for i in range(count)
+        )
+    )
+
+
+def make_domains(count):
+    return [
+        Domain([("state", "=", "open"), "|", ("age", ">", i), ("name", "=", str(i))])
+        for i in range(count)
+    ]
+
+
+@benchmark
+class TestDomainBenchmarks(BaseCase):
+    def assertFaster(self, name, cached, uncached):
+        logger.info(
+            "%s: %.6fs (cached) vs %.6fs (first time); ratio: %.3f",
+            name,
+            cached,
+            uncached,
+            cached / uncached,
+        )
+        self.assertLess(cached, uncached)
+
+    def test_hash_10k_domains(self):
+        domains = make_domains(10000)
+        uncached = timeit(lambda: [hash(domain) for domain in domains])
+        cached = timeit(lambda: [hash(domain) for domain in domains])
+        self.assertFaster("hash 10k domains", cached, uncached)
+
+    def test_compare_10k_domains(self):
+        domains = make_domains(10000)
+        others = [domain.freeze() for domain in make_domains(10000)]
+
+        def compare():
+            for domain, other in zip(domains, others):
+                assert domain == other
+
+        uncached = timeit(compare)
+        cached = timeit(compare)
+        self.assertFaster("compare 10k domains", cached, uncached)
+
+    def test_simplify_large_domains(self):
+        times = {}
+        for count in (1000, 10000, 100000):
+            domain = make_or_domain(count)
+            domain.second_normal_form
+            times[count] = timeit(lambda domain=domain: domain.simplified)
+            logger.info("simplify %d terms: %.6fs", count, times[count])
+        # Simplification is (almost) linear in the number of terms.
+        self.assertLess(times[100000], times[10000] * 10 * 2)
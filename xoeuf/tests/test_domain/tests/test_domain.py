@@ -16,7 +16,7 @@ from hypothesis.stateful import run_state_machine_as_test
 
 from xoeuf.osv import expression as expr
 from xoeuf.osv import ql
-from xoeuf.osv.expression import Domain
+from xoeuf.osv.expression import Domain, FrozenDomain
 
 from xotl.tools.future.collections import opendict
 
@@ -65,6 +65,58 @@ def domains(draw, fields=None, min_size=1, max_size=10):
     return Domain(result)
 
 
+# Terms over a single field to compare with a brute force evaluation.
+term_values = s.integers(min_value=1, max_value=4)
+value_sets = s.lists(term_values, min_size=1, max_size=3).map(tuple)
+
+
+@s.composite
+def field_terms(draw):
+    operator = draw(s.sampled_from(["=", "!=", "<", "<=", ">", ">=", "in", "not in"]))
+    value = draw(value_sets if operator in ("in", "not in") else term_values)
+    return ("x", operator, value)
+
+
+# The values of a field in a record: the empty tuple stands for NULL.  For
+# x2many fields, the values of the related records.
+points = [x / 2 for x in range(11)]
+single_values = [()] + [(x,) for x in points]
+many_values = single_values + [(x, y) for x in points for y in points if x < y]
+
+
+def matches(term, values):
+    _, op, value = term
+    if op in ("!=", "not in"):
+        excluded = (value,) if op == "!=" else value
+        return not any(x in excluded for x in values)
+    check = {
+        "=": lambda x: x == value,
+        "in": lambda x: x in value,
+        "<": lambda x: x < value,
+        "<=": lambda x: x <= value,
+        ">": lambda x: x > value,
+        ">=": lambda x: x >= value,
+    }[op]
+    return any(check(x) for x in values)
+
+
+def evaluate(domain, values):
+    stack = []
+    for kind, term in domain.walk():
+        if kind == expr.KIND_TERM:
+            if term in (expr.TRUE_LEAF, expr.FALSE_LEAF):
+                stack.append(term == expr.TRUE_LEAF)
+            else:
+                stack.append(matches(term, values))
+        elif term == expr.NOT_OPERATOR:
+            stack.append(not stack.pop())
+        elif term == expr.AND_OPERATOR:
+            stack.append(stack.pop() & stack.pop())
+        else:
+            stack.append(stack.pop() | stack.pop())
+    return stack.pop()
+
+
 class TestDomain(BaseCase):
     @given(domains())
     def test_first_normal_form_idempotency(self, domain):
@@ -230,6 +282,121 @@ class TestDomain(BaseCase):
         y = Domain([("field_y", "!=", False), ("field_z", "in", (1, 2, 3))])
         assert x.implies(y)
 
+    def test_simplified_prunes_terms_of_the_same_field(self):
+        domain = Domain([("x", ">", 1), ("x", ">", 3), ("x", "<", 10), ("x", "<", 5)])
+        self.assertEqual(domain.simplified, [("x", ">", 3), ("x", "<", 5)])
+        domain = Domain(["|", ("x", ">", 1), ("x", ">", 3)])
+        self.assertEqual(list(domain.simplified), [("x", ">", 1)])
+        domain = Domain(
+            ["|", "|", ("x", "in", (1, 2)), ("x", "in", (2,)), ("x", "in", (3,))]
+        )
+        self.assertEqual(list(domain.simplified), [("x", "in", (1, 2, 3))])
+        domain = Domain([("x", "in", (1, 2)), ("x", "in", (2,)), ("x", "in", (2, 3))])
+        self.assertEqual(list(domain.simplified), [("x", "in", (2,))])
+
+    def test_simplified_merges_equality_and_membership(self):
+        domain = Domain(["|", "|", ("x", "=", 1), ("x", "=", 2), ("x", "in", (3, 4))])
+        self.assertEqual(list(domain.simplified), [("x", "in", (1, 2, 3, 4))])
+        # False (and 0) are special in Odoo's 'in', strings in '=' for
+        # many2one fields mean 'name_search'.
+        domain = Domain(["|", ("x", "=", 0), ("x", "=", 2)])
+        self.assertEqual(len(domain.simplified), 3)
+        domain = Domain(["|", ("x", "=", "a"), ("x", "=", "b")])
+        self.assertEqual(len(domain.simplified), 3)
+        # Odoo searches by name only if all the values are strings.
+        domain = Domain(["|", ("x", "in", ("Jane",)), ("x", "in", (7,))])
+        self.assertEqual(len(domain.simplified), 3)
+        domain = Domain(["|", ("x", "in", ("Jane", 7)), ("x", "in", (8,))])
+        self.assertEqual(len(domain.simplified), 3)
+        domain = Domain(["|", ("x", "in", ("Jane",)), ("x", "in", ("John",))])
+        self.assertEqual(list(domain.simplified), [("x", "in", ("Jane", "John"))])
+        # Conjunctions are only intersected on demand.
+        domain = Domain([("x", "in", (1, 2, 3)), ("x", "in", (2, 3, 4))])
+        self.assertEqual(len(domain.simplified), 2)
+        self.assertEqual(list(domain.simplify(intersect=True)), [("x", "in", (2, 3))])
+        domain = Domain(["|", "&", ("x", "=", 1), ("x", "in", (2, 3)), ("y", "=", 1)])
+        self.assertEqual(list(domain.simplify(intersect=True)), [("y", "=", 1)])
+        domain = Domain([("x", "=", 1), ("x", "=", 2), ("y", "=", 1)])
+        self.assertEqual(list(domain.simplify(intersect=True)), [expr.FALSE_LEAF])
+
+    @given(field_terms(), field_terms())
+    def test_terms_implication(self, term1, term2):
+        term = expr.DomainTerm(term1)
+        for single_valued, records in ((False, many_values), (True, single_values)):
+            if term.implies(term2, single_valued=single_valued):
+                for values in records:
+                    self.assertTrue(
+                        not matches(term1, values) or matches(term2, values),
+                        msg="%r; values: %r" % (single_valued, values),
+                    )
+
+    def test_implication_across_operators(self):
+        self.assertTrue(Domain([("x", "=", 5)]).implies([("x", ">", 1)]))
+        self.assertTrue(Domain([("x", ">", 5)]).implies([("x", ">=", 5)]))
+        self.assertTrue(Domain([("x", "not in", (1, 2))]).implies([("x", "!=", 1)]))
+        self.assertFalse(Domain([("x", "in", (1, 2))]).implies([("x", "!=", 3)]))
+        self.assertTrue(
+            Domain([("x", "in", (1, 2))]).implies([("x", "!=", 3)], single_valued=True)
+        )
+
+    @settings(deadline=1000)
+    @given(s.lists(field_terms(), min_size=1, max_size=4), connectors)
+    def test_simplified_against_brute_force(self, terms, connector):
+        connector, _ = connector
+        domain = Domain(([connector] * (len(terms) - 1) if connector else []) + terms)
+        simplified = domain.simplified
+        for values in many_values:
+            self.assertEqual(evaluate(domain, values), evaluate(simplified, values))
+        simplified = domain.simplify(intersect=True)
+        for values in single_values:
+            self.assertEqual(evaluate(domain, values), evaluate(simplified, values))
+
+    def test_domain_terms_are_interned(self):
+        term = expr.DomainTerm(("x", "in", [1, 2]))
+        self.assertIs(term, expr.DomainTerm(("x", "in", (1, 2))))
+        self.assertIs(term, expr.DomainTerm(term))
+        self.assertEqual(term, ("x", "in", [1, 2]))
+        self.assertNotEqual(term, ("x", "in", (1, 3)))
+        self.assertIsNot(
+            expr.DomainTerm(("x", "=", 1)), expr.DomainTerm(("x", "=", True))
+        )
+        with self.assertRaises(AttributeError):
+            term.other = 1
+
+    def test_interned_terms_keep_the_types_of_values(self):
+        self.assertIsNot(
+            expr.DomainTerm(("x", "in", (1,))), expr.DomainTerm(("x", "in", (True,)))
+        )
+        self.assertIsNot(
+            expr.DomainTerm(("x", "in", [1])), expr.DomainTerm(("x", "in", [1.0]))
+        )
+        # Keep the first terms alive, so that they are the original ones.
+        terms = [expr.DomainTerm(("x", "<>", 1)), expr.DomainTerm(("y", "in", [1]))]
+        self.assertEqual(list(Domain([("x", "!=", 1)]).simplified), [("x", "!=", 1)])
+        self.assertEqual(
+            list(Domain([("y", "in", (1,))]).simplified), [("y", "in", (1,))]
+        )
+        domain = Domain([("y", "in", (True,))]).simplified
+        self.assertIs(domain[0][2][0], True)
+        self.assertTrue(terms)
+        # The trees keep the terms as given.
+        tree = expr.DomainTree([("x", "!=", 1)])
+        self.assertEqual(tree.get_simplified_domain(), [("x", "!=", 1)])
+        self.assertEqual(tree.get_simplified_domain()[0][1], "!=")
+
+    def test_terms_with_unhashable_values(self):
+        term = expr.DomainTerm(("x", "in", [[1], 2]))
+        self.assertEqual(term, ("x", "in", [[1], 2]))
+        self.assertNotEqual(term, ("x", "in", [[1], 3]))
+        with self.assertRaises(TypeError):
+            hash(term)
+
+    def test_domain_tree_keeps_its_input(self):
+        domain = list(Domain([("a", "=", 1), ("b", "=", 2)]).second_normal_form)
+        expected = list(domain)
+        expr.DomainTree(domain)
+        self.assertEqual(domain, expected)
+
     def test_walk(self):
         y = Domain(
             [
@@ -260,6 +427,66 @@ class TestDomain(BaseCase):
         ]
         self.assertEqual(expected, list(y.walk()))
 
+    def test_normal_forms_are_cached(self):
+        domain = Domain([("a", "=", 1), "!", ("b", "=", 2)])
+        snf = domain._second_normal_form
+        self.assertIsInstance(snf, FrozenDomain)
+        self.assertIs(snf, domain._second_normal_form)
+        self.assertIs(domain._simplified, domain._simplified)
+        # The properties return mutable copies of the cached forms.
+        copy = domain.second_normal_form
+        self.assertNotIsInstance(copy, FrozenDomain)
+        self.assertEqual(copy, snf)
+        copy.append(("d", "=", 5))
+        self.assertNotIn(("d", "=", 5), domain.second_normal_form)
+        simplified = domain.simplified
+        simplified += [("d", "=", 5)]
+        self.assertNotIn(("d", "=", 5), domain.simplified)
+        # Modifying the domain discards the cached forms.
+        domain.append(("c", "=", 3))
+        self.assertIsNot(snf, domain._second_normal_form)
+        self.assertIn(("c", "=", 3), domain.second_normal_form)
+        domain[-1] = ("c", "=", 4)
+        self.assertIn(("c", "=", 4), domain.second_normal_form)
+        self.assertNotIn(("c", "=", 3), domain.second_normal_form)
+
+    def test_deep_domains_dont_recurse(self):
+        depth = 20000
+        domain = []
+        for i in range(depth):
+            domain.extend(["&" if i % 2 else "|", "!", ("a", "=", i)])
+        domain.append(("b", "=", 0))
+        domain = Domain(domain)
+        snf = domain.second_normal_form
+        self.assertEqual(len(snf), 2 * depth + 1)
+        self.assertNotIn("!", snf)
+        self.assertEqual(len(domain.simplified), 2 * depth + 1)
+        self.assertEqual(len(list(domain.walk())), 2 * depth + 1)
+        self.assertFalse(domain.implies([("c", "=", 1)]))
+        self.assertEqual(
+            Domain(["!"] * 1001 + [("a", "=", 1)]).second_normal_form, [("a", "!=", 1)]
+        )
+
+    def test_asfilter_of_long_chains(self):
+        domain = Domain(["|"] * 9999 + [("a", "=", i) for i in range(10000)])
+        self.assertTrue(domain.asfilter()(opendict(a=9999)))
+        self.assertFalse(domain.asfilter()(opendict(a=10000)))
+
+    def test_simplified_keeps_all_operators_of_the_root(self):
+        domain = Domain(["|", "|", ("a", "=", 1), ("b", "=", 2), ("c", "=", 3)])
+        self.assertEqual(domain.simplified.count("|"), 2)
+
+    @given(domains())
+    def test_frozen_domain(self, domain):
+        frozen = domain.freeze()
+        self.assertEqual(frozen, domain)
+        self.assertEqual(hash(frozen), hash(domain))
+        self.assertIs(frozen, frozen.freeze())
+        with self.assertRaises(TypeError):
+            frozen.append(("a", "=", 1))
+        with self.assertRaises(TypeError):
+            frozen += [("a", "=", 1)]
+
 
 class TestDomainFilter(BaseCase):
     def test_get_filter_ast_simple_one_term_with_in(self):
@@ -276,6 +503,28 @@ class TestDomainFilter(BaseCase):
     def test_empty_domain(self):
         self.assertTrue(Domain([]).asfilter()(0))
 
+    def test_asfilter_templates_are_shared(self):
+        objects = [opendict(age=age) for age in range(10)]
+        stats = expr.get_filter_cache_stats()
+        older = Domain([("age", ">", 5)]).asfilter()
+        younger = Domain([("age", "<", 5)]).asfilter()
+        self.assertEqual([o.age for o in objects if older(o)], [6, 7, 8, 9])
+        self.assertEqual([o.age for o in objects if younger(o)], [0, 1, 2, 3, 4])
+        Domain([("age", ">", 1)]).asfilter()
+        Domain([("age", ">", False)]).asfilter(this="that")
+        current = expr.get_filter_cache_stats()
+        self.assertLessEqual(current["misses"] - stats["misses"], 3)
+        self.assertGreaterEqual(current["hits"] - stats["hits"], 1)
+
+    def test_asfilter_without_cache(self):
+        expr.set_filter_cache_size(0)
+        try:
+            self.assertEqual(expr.get_filter_cache_stats()["size"], 0)
+            self.assertTrue(Domain([("age", ">", 5)]).asfilter()(opendict(age=6)))
+            self.assertEqual(expr.get_filter_cache_stats()["size"], 0)
+        finally:
+            expr.set_filter_cache_size(256)
+
     def test_regression_asfilter_with_datetime(self):
         objects = [opendict(date_from=datetime(2020, 6, 5))]
         domain = Domain([("date_from", ">=", datetime(2020, 1, 1))])
@@ -426,6 +675,26 @@ def get_model_domain_machine(this):
             logger.info("Check filter/domain: %s; count: %s", domain, len(res))
             this.assertEqualRecordset(res.filtered(domain.asfilter()), res)
 
+        @rule(
+            domain=domains(
+                fields=s.sampled_from(
+                    [
+                        "age",
+                        "parent_id.age",
+                        "children_ids.age",
+                        "parent_id.parent_id.age",
+                    ]
+                )
+            )
+        )
+        def batch_filter(self, domain):
+            everything = Model.search([])
+            logger.info("Check batch filter: %s", domain)
+            this.assertEqualRecordset(
+                domain.asbatchfilter(everything),
+                everything.filtered(domain.asfilter()),
+            )
+
         @rule(name=names, op=all_operators)
         def find_by_name(self, name, op):
             query = Domain([("name", op, name)])
@@ -500,3 +769,31 @@ class TestConsistencyOfFilters(TransactionCase):
 
     def test_consistency_of_domains(self):
         run_state_machine_as_test(get_model_domain_machine(self))
+
+
+class TestDomainExplain(TransactionCase):
+    def test_explain(self):
+        Partner = self.env["res.partner"]
+        domain = Domain(
+            [("name", "=", "x"), ("comment", "=", "x"), ("parent_id.comment", "=", "y")]
+        )
+        plan = domain.explain(Partner)
+        self.assertGreaterEqual(plan.rows, 0)
+        self.assertGreater(plan.cost, 0)
+        self.assertIn("Node Type", plan.plan)
+        self.assertEqual(
+            plan.warnings,
+            [
+                (("comment", "=", "x"), "unindexed"),
+                (("parent_id.comment", "=", "y"), "subquery"),
+                (("parent_id.comment", "=", "y"), "unindexed"),
+            ],
+        )
+
+    def test_explain_is_cached_per_shape(self):
+        Partner = self.env["res.partner"]
+        plan = Domain([("name", "=", "x")]).explain(Partner)
+        other = Domain([("name", "=", "y")]).explain(Partner)
+        self.assertIs(plan.plan, other.plan)
+        fresh = Domain([("name", "=", "y")]).explain(Partner, cache=False)
+        self.assertIsNot(plan.plan, fresh.plan)
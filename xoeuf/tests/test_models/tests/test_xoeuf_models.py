@@ -8,6 +8,7 @@
 #
 from odoo.tests.common import TransactionCase
 
+from xoeuf.models import get_descendant_model_names, iter_descendant_models
 from xoeuf.models.extensions import get_ref
 
 
@@ -60,3 +61,26 @@ class TestModels(TransactionCase):
             set(Top.iter_descendant_models(find_delegated=False, allow_abstract=True)),
             set([(Foo._name, Foo), (Middleware._name, Middleware)]),
         )
+
+    def test_descendant_model_names_are_cached(self):
+        Top = self.env["test_xoeuf_models.top"]
+        Foo = self.env["test_xoeuf_models.foobar"]
+        names = get_descendant_model_names(self.env, [Top._name], find_delegated=False)
+        self.assertIsInstance(names, frozenset)
+        self.assertEqual(names, {Foo._name})
+        self.assertIs(
+            names,
+            get_descendant_model_names(
+                self.registry, [Top._name], find_delegated=False
+            ),
+        )
+        self.assertEqual(
+            set(iter_descendant_models(self.env, [Top._name], find_delegated=False)),
+            {(Foo._name, Foo)},
+        )
+        self.assertIs(
+            names,
+            get_descendant_model_names(
+                self.env, iter([Top._name]), find_delegated=False
+            ),
+        )
@@ -33,6 +33,7 @@ class SignalingModel(models.Model):
     _inherit = ["test_signals.fvg"]
 
     name = fields.Char()
+    code = fields.Char()
 
 
 @signals.receiver(signals.post_save, sender="test_signals.signaling_model")
@@ -63,3 +64,24 @@ def pre_search_receiver(sender, signal, **kwargs):
 @signals.receiver(signals.pre_fields_view_get, sender="test_signals.signaling_model")
 def pre_fvg_receiver(sender, signal, **kwargs):
     pass
+
+
+@signals.receiver(
+    signals.post_write, sender="test_signals.signaling_model", deferred="commit"
+)
+def deferred_post_write_receiver(sender, signal, **kwargs):
+    pass
+
+
+@signals.receiver(
+    signals.post_write, sender="test_signals.signaling_model", coalesce=True
+)
+def coalescing_post_write_receiver(sender, signal, **kwargs):
+    pass
+
+
+@signals.receiver(
+    signals.post_write, sender="test_signals.signaling_model", fields=["code"]
+)
+def code_post_write_receiver(sender, signal, **kwargs):
+    pass
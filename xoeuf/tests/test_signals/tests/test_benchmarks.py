@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Micro-benchmarks for the signals.
+
+These are skipped unless the environment variable XOEUF_BENCHMARKS is set.
+
+"""
+import logging
+
+from xoeuf.signals import (
+    no_signals,
+    post_save,
+    pre_search,
+    super_search,
+    super_write,
+)
+from xoeuf.testing.benchmarks import TOLERANCE, benchmark, best_of
+
+from odoo.tests.common import TransactionCase, at_install, post_install
+
+logger = logging.getLogger(__name__)
+
+
+@benchmark
+@at_install(False)
+@post_install(True)
+class TestUnlistenedModelsOverhead(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.partner = self.env["res.partner"].create({"name": "Benchmark"})
+
+    def assertWithinNoise(self, name, patched, vanilla):
+        logger.info(
+            "%s: %.6fs (signals) vs %.6fs (vanilla); ratio: %.3f",
+            name,
+            patched,
+            vanilla,
+            patched / vanilla,
+        )
+        self.assertLessEqual(patched, vanilla * TOLERANCE)
+
+    def test_search(self):
+        Partner = self.env["res.partner"]
+        domain = [("id", "=", self.partner.id)]
+        vanilla = best_of(lambda: super_search(Partner, domain))
+        patched = best_of(lambda: Partner.search(domain))
+        self.assertWithinNoise("search", patched, vanilla)
+
+    def test_write(self):
+        # The test addon has post_save receivers for all models.
+        with no_signals(*post_save):
+            partner = self.partner
+            vanilla = best_of(lambda: super_write(partner, {"comment": "vanilla"}))
+            patched = best_of(lambda: partner.write({"comment": "patched"}))
+        self.assertWithinNoise("write", patched, vanilla)
+
+
+@benchmark
+@at_install(False)
+@post_install(True)
+class TestSearchSignalsOverhead(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.partner = self.env["res.partner"].create({"name": "Benchmark"})
+
+    def test_readonly_receivers(self):
+        def _receiver(sender, signal, **kwargs):
+            pass
+
+        Partner = self.env["res.partner"]
+        domain = [("id", "=", self.partner.id)]
+        pre_search.connect(_receiver, sender=Partner._name, readonly=True)
+        try:
+            vanilla = best_of(lambda: super_search(Partner, domain), 100000, 1)
+            patched = best_of(lambda: Partner.search(domain), 100000, 1)
+        finally:
+            pre_search.disconnect(_receiver, sender=Partner._name)
+        logger.info(
+            "100k searches: %.6fs (signals) vs %.6fs (vanilla); ratio: %.3f",
+            patched,
+            vanilla,
+            patched / vanilla,
+        )
+        self.assertLessEqual(patched, vanilla * TOLERANCE)
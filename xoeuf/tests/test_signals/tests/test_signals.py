@@ -6,17 +6,37 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+from unittest.mock import patch
+
 from xotl.tools.future.codecs import safe_decode
 
 from xoeuf.signals import (
+    _attach,
+    _deferred,
+    _detach,
+    coalesce,
+    disable_instrumentation,
+    disable_search_cache,
+    enable_instrumentation,
+    enable_search_cache,
+    get_instrumentation,
+    get_deferred_stats,
+    get_installed_addons,
+    get_search_cache_stats,
+    set_deferred_executor,
     mock_replace,
     post_create,
+    post_write,
     pre_create,
+    pre_search,
+    post_search,
     write_wrapper,
     pre_fields_view_get,
     no_signals,
+    Signal,
 )
 
+from odoo import models
 from odoo.tests.common import TransactionCase, at_install, post_install
 
 # Don't import relatively
@@ -24,8 +44,12 @@ from odoo.addons.test_signals.models import (
     post_save_receiver,
     post_save_receiver_all_models,
     pre_save_receiver,
+    deferred_post_write_receiver,
+    coalescing_post_write_receiver,
+    code_post_write_receiver,
     wrap_nothing,
     pre_fvg_receiver,
+    pre_search_receiver,
 )
 
 
@@ -110,3 +134,353 @@ class TestXoeufSignals(TransactionCase):
             # create.
             self.assertEqual(mock.call_count, 1)
             self.assertEqual(len(result), 2)
+
+    def test_live_hooks_are_cached(self):
+        hooks = post_create.live_hooks(self.Model)
+        self.assertIn(post_save_receiver, hooks)
+        self.assertIs(hooks, post_create.live_hooks(self.Model))
+        # Other signals have their own dispatch table.
+        self.assertIsNot(hooks, post_write.live_hooks(self.Model))
+
+    def test_connect_discards_dispatch_table(self):
+        def _receiver(sender, signal, **kwargs):
+            pass
+
+        hooks = post_create.live_hooks(self.Model)
+        post_create.connect(_receiver, sender=self.Model._name, framework=True)
+        try:
+            self.assertIn(_receiver, post_create.live_hooks(self.Model))
+        finally:
+            post_create.disconnect(_receiver, sender=self.Model._name)
+        self.assertNotIn(_receiver, post_create.live_hooks(self.Model))
+        self.assertEqual(hooks, post_create.live_hooks(self.Model))
+
+    def test_receivers_order(self):
+        def _first(sender, signal, **kwargs):
+            pass
+
+        def _second(sender, signal, **kwargs):
+            pass
+
+        post_create.connect(_first, framework=True)
+        post_create.connect(_second, sender=self.Model._name, framework=True)
+        post_create.connect(_first, sender=self.Model._name, framework=True)
+        try:
+            hooks = [
+                hook
+                for hook in post_create.live_hooks(self.Model)
+                if hook in (_first, _second)
+            ]
+            self.assertEqual(hooks, [_first, _second, _first])
+            hooks = [
+                hook
+                for hook in post_create.live_hooks(self.env["res.partner"])
+                if hook in (_first, _second)
+            ]
+            self.assertEqual(hooks, [_first])
+        finally:
+            post_create.disconnect(_first)
+            post_create.disconnect(_second, sender=self.Model._name)
+        hooks = [hook for _, hook in post_create.hooks if hook in (_first, _second)]
+        self.assertEqual(hooks, [_first])
+        post_create.disconnect(_first, sender=self.Model._name)
+        self.assertNotIn(_first, post_create.live_hooks(self.Model))
+
+    def test_receivers_priority(self):
+        def _check(sender, signal, **kwargs):
+            return kwargs.get("veto")
+
+        def _expensive(sender, signal, **kwargs):
+            return "done"
+
+        post_create.connect(_expensive, sender=self.Model._name, framework=True)
+        post_create.connect(
+            _check,
+            sender=self.Model._name,
+            framework=True,
+            priority=-10,
+            stop_on=bool,
+        )
+        try:
+            hooks = [
+                hook
+                for hook in post_create.live_hooks(self.Model)
+                if hook in (_check, _expensive)
+            ]
+            self.assertEqual(hooks, [_check, _expensive])
+            responses = post_create.send(self.Model, veto=True)
+            self.assertEqual(responses, [(_check, True)])
+            responses = post_create.safe_send(self.Model, veto=False)
+            self.assertIn((_expensive, "done"), responses)
+        finally:
+            post_create.disconnect(_check, sender=self.Model._name)
+            post_create.disconnect(_expensive, sender=self.Model._name)
+
+    def test_receivers_filtered_by_fields(self):
+        who = self.Model.create(dict(name="My name"))
+        with mock_replace(post_write, code_post_write_receiver) as mock:
+            who.write(dict(name="My new name"))
+            self.assertFalse(mock.called)
+            who.write(dict(name="My name", code="My code"))
+            self.assertEqual(mock.call_count, 1)
+            # Without values, the receiver can't be filtered.
+            post_write.send(who)
+            self.assertEqual(mock.call_count, 2)
+
+    def test_no_signals_discards_dispatch_table(self):
+        self.assertTrue(post_create.live_hooks(self.Model))
+        with no_signals(post_create):
+            self.assertFalse(post_create.live_hooks(self.Model))
+        self.assertTrue(post_create.live_hooks(self.Model))
+
+    def test_unlistened_models_bypass_signals(self):
+        # There are no receivers of pre_search for partners.
+        with patch.object(pre_search, "send") as send:
+            self.env["res.partner"].search([])
+            self.assertFalse(send.called)
+        with patch.object(pre_search, "send") as send:
+            self.Model.search([])
+            self.assertTrue(send.called)
+
+    def test_search_query_is_copied_on_write(self):
+        def restrict(sender, signal, query=None, **kwargs):
+            self.assertIsInstance(query, list)
+            query += [("name", "=", "Other")]
+
+        who = self.Model.create(dict(name="My name"))
+        domain = [("id", "=", who.id)]
+        self.assertEqual(self.Model.search(domain), who)
+        with mock_replace(pre_search, pre_search_receiver, side_effect=restrict):
+            self.assertFalse(self.Model.search(domain))
+        self.assertEqual(domain, [("id", "=", who.id)])
+
+    def test_search_readonly_receivers(self):
+        queries = []
+
+        def _receiver(sender, signal, query=None, **kwargs):
+            queries.append(query)
+
+        Partner = self.env["res.partner"]
+        pre_search.connect(_receiver, sender=Partner._name, readonly=True)
+        try:
+            self.assertTrue(pre_search.is_readonly(Partner))
+            self.assertFalse(pre_search.is_readonly(self.Model))
+            domain = [("id", "=", 0)]
+            Partner.search(domain)
+            self.assertEqual(queries, [domain])
+            self.assertIs(queries[0], domain)
+            # Receivers of post_search which are not read-only get a copy.
+            post_search.connect(_receiver, sender=Partner._name)
+            try:
+                Partner.search(domain)
+            finally:
+                post_search.disconnect(_receiver, sender=Partner._name)
+            self.assertEqual(queries[1:], [domain, domain])
+            self.assertIsNot(queries[1], domain)
+            self.assertIs(queries[1], queries[2])
+        finally:
+            pre_search.disconnect(_receiver, sender=Partner._name)
+
+    def test_search_cache(self):
+        first = self.Model.create(dict(name="First", code="a"))
+        second = self.Model.create(dict(name="Second", code="b"))
+        self.Model.create(dict(name="Third", code="c"))
+        enable_search_cache(self.env)
+        try:
+            stats = get_search_cache_stats()
+            domain = [("code", "in", ("a", "b"))]
+            self.assertEqual(self.Model.search(domain), first | second)
+            self.assertEqual(self.Model.search(domain), first | second)
+            self.assertEqual(self.Model.search([("code", "=", "b")]), second)
+            self.assertEqual(
+                self.Model.search(
+                    ["&", ("code", "!=", "a"), ("code", "in", ("a", "b"))]
+                ),
+                second,
+            )
+            after = get_search_cache_stats()
+            self.assertEqual(after["misses"], stats["misses"] + 1)
+            self.assertEqual(after["hits"], stats["hits"] + 1)
+            self.assertEqual(after["implied"], stats["implied"] + 2)
+            # Changes in the model discard the results.
+            second.write(dict(code="c"))
+            self.assertEqual(self.Model.search([("code", "=", "b")]), self.Model)
+            self.assertEqual(get_search_cache_stats()["misses"], stats["misses"] + 2)
+        finally:
+            disable_search_cache(self.env)
+
+    def test_search_cache_keeps_archived_records_apart(self):
+        Partner = self.env["res.partner"]
+        active = Partner.create(dict(name="Cached partner"))
+        archived = Partner.create(dict(name="Cached partner", active=False))
+        enable_search_cache(self.env)
+        try:
+            domain = [("name", "=", "Cached partner")]
+            self.assertEqual(Partner.search(domain), active)
+            self.assertEqual(
+                Partner.search(domain + [("active", "!=", True)]), archived
+            )
+        finally:
+            disable_search_cache(self.env)
+
+    def test_search_cache_follows_relations(self):
+        Users = self.env["res.users"]
+        partner = self.env.user.partner_id
+        domain = [("partner_id.name", "=", partner.name)]
+        enable_search_cache(self.env)
+        try:
+            self.assertIn(self.env.user, Users.search(domain))
+            # Changes in the traversed models discard the results.
+            partner.write(dict(name=partner.name + " (changed)"))
+            self.assertNotIn(self.env.user, Users.search(domain))
+            # Malformed domains are left to the search.
+            with self.assertRaises(ValueError):
+                Users.search([("login", "=")])
+            self.assertIs(enable_search_cache(self.env), enable_search_cache(self.env))
+        finally:
+            disable_search_cache(self.env)
+
+    def test_installed_addons(self):
+        addons = get_installed_addons(self.env)
+        self.assertIn("base", addons)
+        self.assertIn("test_signals", addons)
+        self.assertIs(addons, get_installed_addons(self.env))
+
+    def test_deferred_receivers_wait_for_commit(self):
+        class Executor:
+            def __init__(self):
+                self.submitted = []
+
+            def submit(self, fn, *args):
+                self.submitted.append(args)
+
+        who = self.Model.create(dict(name="My name"))
+        executor = Executor()
+        set_deferred_executor(executor)
+        try:
+            with mock_replace(post_write, deferred_post_write_receiver) as mock:
+                waiting = get_deferred_stats()["waiting"]
+                who.write(dict(name="My new name"))
+                self.assertFalse(mock.called)
+                self.assertEqual(get_deferred_stats()["waiting"], waiting + 1)
+                # Simulate the commit, we can't commit in tests.
+                _deferred.commit(self.cr)
+                self.assertEqual(get_deferred_stats()["waiting"], waiting)
+                [(event, _)] = executor.submitted
+                self.assertEqual(event.sender.model, self.Model._name)
+                self.assertEqual(event.sender.ids, tuple(who.ids))
+                self.assertEqual(event.kwargs["values"], dict(name="My new name"))
+        finally:
+            set_deferred_executor(None)
+
+    def test_deferred_receivers_skip_rolled_back_savepoints(self):
+        who = self.Model.create(dict(name="My name"))
+        with mock_replace(post_write, deferred_post_write_receiver):
+            waiting = get_deferred_stats()["waiting"]
+            with self.assertRaises(ZeroDivisionError):
+                with self.cr.savepoint():
+                    who.write(dict(name="Rolled back"))
+                    raise ZeroDivisionError
+            self.assertEqual(get_deferred_stats()["waiting"], waiting)
+            with self.cr.savepoint():
+                who.write(dict(name="Kept"))
+            self.assertEqual(get_deferred_stats()["waiting"], waiting + 1)
+
+    def test_unhashable_senders(self):
+        signal = Signal("test_unhashable_senders")
+        calls = []
+
+        def receiver(sender, signal, **kwargs):
+            calls.append(sender)
+
+        signal.connect(receiver, sender={"a": 1}, require_registry=False)
+        signal.send({"a": 1})
+        signal.send({"b": 2})
+        self.assertEqual(calls, [{"a": 1}])
+        signal.disconnect(receiver, sender={"a": 1})
+        self.assertFalse(signal.hooks)
+
+    def test_deferred_arguments_are_detached(self):
+        who = self.Model.create(dict(name="My name"))
+        value = dict(records=who, nested=[who, (who, 1)], values=dict(who=who))
+        detached = _detach(value)
+        self.assertNotIsInstance(detached["records"], models.BaseModel)
+        self.assertNotIsInstance(detached["nested"][1][0], models.BaseModel)
+        self.assertNotIsInstance(detached["values"]["who"], models.BaseModel)
+        self.assertEqual(_attach(detached, self.env), value)
+
+    def test_deferred_receivers_discarded_on_rollback(self):
+        who = self.Model.create(dict(name="My name"))
+        waiting = get_deferred_stats()["waiting"]
+        who.write(dict(name="My new name"))
+        self.assertEqual(get_deferred_stats()["waiting"], waiting + 1)
+        self.cr.rollback()
+        self.assertEqual(get_deferred_stats()["waiting"], waiting)
+
+    def test_coalesce(self):
+        records = [self.Model.create(dict(name="Record %d" % i)) for i in range(3)]
+        with mock_replace(post_write, coalescing_post_write_receiver) as mock:
+            with coalesce(post_write):
+                for record in records:
+                    record.write(dict(name="New name"))
+                self.assertFalse(mock.called)
+            self.assertEqual(mock.call_count, 1)
+            (sender, signal), kwargs = mock.call_args
+            self.assertEqual(sender, records[0] | records[1] | records[2])
+            self.assertEqual(kwargs["values"], dict(name="New name"))
+            # Outside the scope calls are not coalesced.
+            records[0].write(dict(name="Other name"))
+            self.assertEqual(mock.call_count, 2)
+
+    def test_coalesce_different_keys(self):
+        record = self.Model.create(dict(name="Record"))
+        with mock_replace(post_write, coalescing_post_write_receiver) as mock:
+            with coalesce(post_write) as scope:
+                record.write(dict(name="New name"))
+                record.write(dict(name="New name", code="New code"))
+                scope.flush()
+                self.assertEqual(mock.call_count, 2)
+                record.write(dict(name="Other name"))
+            self.assertEqual(mock.call_count, 3)
+
+    def test_coalesce_discards_calls_on_errors(self):
+        record = self.Model.create(dict(name="Record"))
+        with mock_replace(post_write, coalescing_post_write_receiver) as mock:
+            with self.assertRaises(ZeroDivisionError):
+                with coalesce(post_write):
+                    record.write(dict(name="New name"))
+                    1 / 0
+            self.assertFalse(mock.called)
+
+    def test_instrumentation(self):
+        self.assertIsNone(get_instrumentation())
+        stats = enable_instrumentation()
+        try:
+            self.assertIs(stats, get_instrumentation())
+            who = self.Model.create(dict(name="My name"))
+            who.write(dict(name="My new name"))
+            who.write(dict(name="My other name"))
+        finally:
+            self.assertIs(stats, disable_instrumentation())
+        self.assertIsNone(get_instrumentation())
+        snapshot = {
+            (item["signal"], item["receiver"].rsplit(".", 1)[-1], item["model"]): item
+            for item in stats.snapshot()
+        }
+        item = snapshot[("pre_write", "pre_save_receiver", self.Model._name)]
+        self.assertEqual(item["calls"], 2)
+        self.assertEqual(item["errors"], 0)
+        self.assertGreater(item["total"], 0)
+        self.assertEqual(set(item["percentiles"]), set(stats.quantiles))
+        item = snapshot[("write_wrapper", "wrap_nothing", self.Model._name)]
+        self.assertEqual(item["calls"], 2)
+        self.assertIn("pre_save_receiver", stats.as_json())
+        self.assertIn(
+            "# TYPE xoeuf_signal_receiver_seconds summary", stats.as_prometheus()
+        )
+        # Once disabled no more stats are collected.
+        who.write(dict(name="My name"))
+        self.assertEqual(
+            sum(item["calls"] for item in stats.snapshot()),
+            sum(item["calls"] for item in snapshot.values()),
+        )
@@ -56,3 +56,32 @@ class TextOnUpdateMixin(models.AbstractModel):
 class Model(models.Model):
     _name = "text.onupdate.big.model"
     _inherit = TextOnUpdateMixin._name
+
+
+class PartnerOnUpdateModel(models.Model):
+    _name = "text.onupdate.partner.model"
+
+    partner_id = fields.Many2one("res.partner")
+    name = fields.Char()
+    updates = fields.Integer()
+
+    @api.onupdate(
+        "partner_id.name",
+        "partner_id.child_ids.name",
+        "partner_id.category_id.name",
+        writes=("name", "updates"),
+    )
+    def update_name(self):
+        for record in self:
+            partner = record.partner_id
+            names = (
+                [partner.name]
+                + partner.child_ids.mapped("name")
+                + partner.category_id.mapped("name")
+            )
+            record.write(
+                {
+                    "name": " ".join(sorted(filter(None, names))),
+                    "updates": record.updates + 1,
+                }
+            )
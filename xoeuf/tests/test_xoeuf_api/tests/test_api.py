@@ -6,6 +6,15 @@
 #
 # This is free software; you can do what the LICENCE file allows you to.
 #
+import json
+
+from xoeuf.models import (
+    OnUpdateGraph,
+    OnUpdateQueue,
+    deferred_onupdate,
+    get_onupdate_graph,
+)
+
 from odoo.tests.common import TransactionCase
 
 
@@ -89,3 +98,142 @@ class TestFromActiveIds(TransactionCase):
         user = self.env.user
         # Just check we don't raise an exception.
         user._validate_fields("unknown_field_name_" + str(id(self)))
+
+    def test_onupdate_through_relations(self):
+        Partner = self.env["res.partner"]
+        partner = Partner.create({"name": "A"})
+        obj = self.env["text.onupdate.partner.model"].create({"partner_id": partner.id})
+        self.assertEqual(obj.name, "A")
+        child = Partner.create({"name": "B", "parent_id": partner.id})
+        self.assertEqual(obj.name, "A B")
+        child.name = "C"
+        self.assertEqual(obj.name, "A C")
+        category = self.env["res.partner.category"].create({"name": "D"})
+        partner.category_id = category
+        self.assertEqual(obj.name, "A C D")
+        category.name = "E"
+        self.assertEqual(obj.name, "A C E")
+
+    def test_onupdate_targets_are_found_with_sql(self):
+        Partner = self.env["res.partner"]
+        Model = self.env["text.onupdate.partner.model"]
+        parent = Partner.create({"name": "A"})
+        child = Partner.create({"name": "B", "parent_id": parent.id})
+        other = Partner.create({"name": "C"})
+        for partner in (parent, child, other):
+            Model.create({"partner_id": partner.id})
+        partners = parent | child
+        paths = {
+            path
+            for _, model_name, path in Partner._method_triggers[Partner._fields["name"]]
+            if model_name == Model._name
+        }
+        self.assertEqual(paths, {"partner_id", "partner_id.child_ids"})
+        targets = partners._get_onupdate_targets(Model._name, paths)
+        for path in paths:
+            self.assertIsNotNone(Model._get_onupdate_query(path))
+            expected = partners._search_onupdate_targets(Model._name, [path])
+            self.assertEqual(targets[path], set(expected.ids))
+        self.assertEqual(len(targets["partner_id"]), 2)
+        self.assertEqual(len(targets["partner_id.child_ids"]), 1)
+
+    def test_deferred_onupdate(self):
+        partner = self.env["res.partner"].create({"name": "A"})
+        obj = self.env["text.onupdate.partner.model"].create({"partner_id": partner.id})
+        updates = obj.updates
+        for name in "BCD":
+            partner.name = name
+        self.assertEqual(obj.updates, updates + 3)
+        with deferred_onupdate(self.env) as queue:
+            for name in "EFG":
+                partner.name = name
+            self.assertEqual(len(queue), 1)
+            self.assertEqual(obj.name, "D")
+        self.assertEqual(obj.name, "G")
+        self.assertEqual(obj.updates, updates + 4)
+        with self.assertRaises(ZeroDivisionError):
+            with deferred_onupdate(self.env):
+                partner.name = "H"
+                raise ZeroDivisionError
+        self.assertEqual(obj.name, "G")
+
+    def test_onupdate_graph(self):
+        graph = get_onupdate_graph(self.env)
+        node = ("text.onupdate.partner.model", "update_name")
+        self.assertIn(node, graph.order)
+        self.assertEqual(graph.writes[node], {"name", "updates"})
+        self.assertEqual(graph.get_fanout("res.partner.category", "name"), 1)
+        self.assertGreaterEqual(graph.get_fanout("res.partner", "name"), 2)
+        self.assertEqual(graph.cycles, [])
+        copy = OnUpdateGraph.from_dict(json.loads(json.dumps(graph.as_dict())))
+        self.assertEqual(copy.triggers, graph.triggers)
+        self.assertEqual(copy.order, graph.order)
+
+    def test_onupdate_graph_cycles(self):
+        graph = OnUpdateGraph(
+            {
+                ("a", "x"): [("b", "update_y", "a_id")],
+                ("b", "y"): [("a", "update_x", "b_id"), ("c", "update", "b_id")],
+            },
+            {("a", "update_x"): ["x"], ("b", "update_y"): ["y"]},
+        )
+        self.assertEqual(graph.cycles, [(("a", "update_x"), ("b", "update_y"))])
+        self.assertLess(graph.get_rank("a", "update_x"), graph.get_rank("c", "update"))
+        self.assertEqual(graph.undeclared, [])
+        graph = OnUpdateGraph(
+            {
+                ("a", "x"): [("a", "update_x", "id")],
+                ("b", "y"): [("c", "update", "b_id")],
+            },
+            {},
+        )
+        # No field of 'c' triggers updaters, whatever its updater writes.
+        self.assertEqual(graph.undeclared, [("a", "update_x")])
+
+    def test_onupdate_queue_stops_cycles(self):
+        partner = self.env["res.partner"].create({"name": "A"})
+        queue = OnUpdateQueue()
+
+        def update_forever(records):
+            queue.push(update_forever, records)
+
+        queue.push(update_forever, partner)
+        with self.assertRaisesRegex(RuntimeError, "update_forever"):
+            queue.drain()
+        self.assertEqual(len(queue), 0)
+
+    def test_onupdate_queue_counts_calls_per_records(self):
+        partners = self.env["res.partner"].create([{"name": str(i)} for i in range(10)])
+        queue = OnUpdateQueue()
+        queue.max_calls = 2
+        called = []
+
+        def update_next(records):
+            called.append(records)
+            if len(called) < len(partners):
+                queue.push(update_next, partners[len(called)])
+
+        queue.push(update_next, partners[0])
+        queue.drain()
+        self.assertEqual(len(called), len(partners))
+
+    def test_onupdate_skips_unchanged_values(self):
+        Partner = self.env["res.partner"]
+        Model = self.env["text.onupdate.partner.model"]
+        partner, other = Partner.create({"name": "A"}), Partner.create({"name": "B"})
+        obj = Model.create({"partner_id": partner.id})
+        obj2 = Model.create({"partner_id": other.id})
+        updates, updates2 = obj.updates, obj2.updates
+        partner.name = "A"
+        self.assertEqual(obj.updates, updates)
+        (partner | other).write({"name": "A", "comment": "Changed"})
+        self.assertEqual(obj.updates, updates)
+        self.assertEqual(obj2.updates, updates2 + 1)
+        self.assertEqual(obj2.name, "A")
+        category = self.env["res.partner.category"].create({"name": "C"})
+        partner.category_id = category
+        self.assertEqual(obj.updates, updates + 1)
+        partner.write({"category_id": [(6, 0, category.ids)]})
+        partner.write({"category_id": [(4, category.id)]})
+        self.assertEqual(obj.updates, updates + 1)
+        self.assertEqual(obj.name, "A C")
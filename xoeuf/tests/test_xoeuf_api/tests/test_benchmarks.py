@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------
+# Copyright (c) Merchise Autrement [~º/~] and Contributors
+# All rights reserved.
+#
+# This is free software; you can do what the LICENCE file allows you to.
+#
+"""Micro-benchmarks for the onupdate triggers.
+
+These are skipped unless the environment variable XOEUF_BENCHMARKS is set.
+
+"""
+import logging
+from collections import defaultdict
+
+from odoo.tests.common import TransactionCase, at_install, post_install
+from xoeuf.testing.benchmarks import benchmark, best_of
+
+logger = logging.getLogger(__name__)
+
+# The number of records written at once.
+SIZE = 10000
+
+
+@benchmark
+@at_install(False)
+@post_install(True)
+class TestOnUpdateTargets(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        Partner = self.env["res.partner"]
+        Model = self.env["text.onupdate.partner.model"]
+        self.partners = Partner.create([{"name": str(i)} for i in range(SIZE)])
+        Model.create([{"partner_id": partner.id} for partner in self.partners])
+
+    def test_resolution_of_name_triggers(self):
+        partners = self.partners
+        triggers = defaultdict(lambda: defaultdict(set))
+        for method, model_name, path in partners._method_triggers[
+            partners._fields["name"]
+        ]:
+            triggers[model_name][method].add(path)
+
+        def per_method():
+            for model_name, methods in triggers.items():
+                for paths in methods.values():
+                    partners._search_onupdate_targets(model_name, paths)
+
+        def batched():
+            for model_name, methods in triggers.items():
+                paths = set().union(*methods.values())
+                partners._get_onupdate_targets(model_name, paths)
+
+        searched = best_of(per_method, 10, 3)
+        joined = best_of(batched, 10, 3)
+        logger.info(
+            "Targets of %d records: %.6fs (batched) vs %.6fs (search); ratio: %.3f",
+            SIZE,
+            joined,
+            searched,
+            joined / searched,
+        )
+        self.assertLessEqual(joined, searched)